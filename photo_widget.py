@@ -1,29 +1,3059 @@
+import time
+STARTED_AT = time.perf_counter()  # 첫 화면 표시까지 걸린 시간의 기준
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 import json
-import subprocess
 from PIL import Image, ImageTk
 import threading
-import time
 import random
-import winreg
+try:
+    import winreg
+except ImportError:  # 윈도우가 아닌 환경 (벤치마크 등 헤드리스 실행)
+    winreg = None
 import sys # sys 모듈 추가
+import hashlib
+import select
+import contextlib
+import io
+import errno
+import queue
+from array import array
+from collections import ChainMap, OrderedDict, deque
+from itertools import accumulate, compress, filterfalse, repeat
+from concurrent.futures import ThreadPoolExecutor, BrokenExecutor, CancelledError, Future
+from concurrent.futures import TimeoutError as FutureTimeout
+# multiprocessing, ctypes, csv, argparse는 쓰는 곳에서 처음 필요할 때 import
+# (로그인 직후 자동 시작할 때 첫 화면을 늦추지 않도록)
+
+
+def fit_size(size, box, upscale=False):
+    """size(너비, 높이)를 비율을 유지한 채 box 안에 들어가도록 줄인 크기"""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height)
+    if not upscale:
+        scale = min(scale, 1.0)
+    return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+
+
+# EXIF 태그 번호
+EXIF_ORIENTATION = 0x0112
+EXIF_DATETIME = 0x0132
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+
+# EXIF 방향 값 -> 똑바로 세우는 변환 (1은 그대로, 5~8은 가로/세로가 바뀜)
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def header_exif(image):
+    """픽셀을 디코딩하지 않고 얻을 수 있는 EXIF
+    
+    PNG는 EXIF가 이미지 데이터 뒤에 있으면 getexif()가 전체를 디코딩하므로 무시
+    """
+    if image.format == 'PNG' and 'exif' not in image.info:
+        return Image.Exif()
+    try:
+        return image.getexif()
+    except Exception:
+        return Image.Exif()
+
+
+def exif_orientation(image):
+    """열린 이미지의 EXIF 방향 값 (없거나 잘못된 값이면 1)"""
+    orientation = header_exif(image).get(EXIF_ORIENTATION, 1)
+    return orientation if orientation in EXIF_TRANSPOSE else 1
+
+
+def oriented_size(image, orientation=None):
+    """방향을 적용한 뒤의 (너비, 높이)"""
+    if orientation is None:
+        orientation = exif_orientation(image)
+    width, height = image.size
+    return (height, width) if orientation in (5, 6, 7, 8) else (width, height)
+
+
+def image_metadata(image):
+    """열린 이미지의 헤더 정보 [너비, 높이, 방향, 촬영일('YYYY-MM-DD' 또는 '')]
+    
+    너비/높이는 방향을 적용한 뒤의 크기
+    """
+    exif = header_exif(image)
+    orientation = exif.get(EXIF_ORIENTATION, 1)
+    if orientation not in EXIF_TRANSPOSE:
+        orientation = 1
+    try:
+        taken = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    except Exception:
+        taken = None
+    # EXIF 날짜 형식: 'YYYY:MM:DD HH:MM:SS'
+    if isinstance(taken, str) and len(taken) >= 10 and taken[:4].isdigit():
+        taken = taken[:10].replace(':', '-')
+    else:
+        taken = ''
+    width, height = oriented_size(image, orientation)
+    return [width, height, orientation, taken]
+
+
+def read_image_metadata(image_path, files=None):
+    """이미지 파일의 헤더만 읽어 image_metadata() 반환 (픽셀은 디코딩하지 않음)"""
+    if files is None:
+        with Image.open(image_path) as image:
+            return image_metadata(image)
+    with files.open_head(image_path) as f, Image.open(f) as image:
+        return image_metadata(image)
+
+class StageMetrics:
+    """단계별 소요 시간(최근 window개)과 캐시 적중/실패 등 횟수 기록
+    
+    꺼져 있으면 stage()가 아무 일도 하지 않는 공용 컨텍스트 매니저를 돌려주고
+    count()도 바로 반환하므로 표시 경로에 거의 비용이 들지 않는다.
+    """
+
+    NULL_STAGE = contextlib.nullcontext()
+
+    def __init__(self, enabled=False, window=500):
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}   # 단계 이름 -> 최근 소요 시간(초) deque
+        self.counters = {}  # 이름 -> 횟수
+        self.lock = threading.Lock()
+    
+    def stage(self, name):
+        """with 문으로 감싼 구간의 소요 시간 기록"""
+        if not self.enabled:
+            return self.NULL_STAGE
+        return self._timer(name)
+    
+    @contextlib.contextmanager
+    def _timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+    
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+    
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def summary(self):
+        """단계별 횟수, 평균, p50/p95/p99, 최대 (ms)와 카운터"""
+        with self.lock:
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+            counters = dict(self.counters)
+        stages = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            def at(fraction):
+                return round(values[min(len(values) - 1, int(fraction * len(values)))] * 1000, 2)
+            stages[name] = {'count': len(values),
+                            'mean_ms': round(sum(values) / len(values) * 1000, 2),
+                            'p50_ms': at(0.50), 'p95_ms': at(0.95), 'p99_ms': at(0.99),
+                            'max_ms': round(values[-1] * 1000, 2)}
+        return {'stages': stages, 'counters': counters}
+    
+    def export(self, file_path):
+        """요약을 JSON 또는 CSV(확장자로 구분) 파일로 저장"""
+        import csv
+        summary = self.summary()
+        if file_path.lower().endswith('.csv'):
+            columns = ['count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+            with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['name'] + columns)
+                for name, values in summary['stages'].items():
+                    writer.writerow([name] + [values[column] for column in columns])
+                for name, value in summary['counters'].items():
+                    writer.writerow([name, value] + [''] * (len(columns) - 1))
+        else:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+# 측정하지 않을 때 쓰는 기본값
+NO_METRICS = StageMetrics(enabled=False)
+
+
+def load_display_image(image_path, box, metrics=NO_METRICS):
+    """이미지를 열어 box(너비, 높이) 안에 들어가도록 축소한 PIL 이미지 반환"""
+    with metrics.stage('open'):
+        image = Image.open(image_path)
+    with image:
+        # 90도 돌아간 사진은 돌리기 전 픽셀 기준으로 가로/세로를 바꾼 상자에 맞춤
+        orientation = exif_orientation(image)
+        if orientation in (5, 6, 7, 8):
+            box = (box[1], box[0])
+        with metrics.stage('decode'):
+            # JPEG는 최종 크기를 덮는 가장 작은 DCT 축소(1/2, 1/4, 1/8)로만 디코딩
+            # draft를 지원하지 않는 포맷은 그대로 두고 thumbnail의 reduce 단계에 맡김
+            image.draft(None, fit_size(image.size, box))
+            image.load()
+        with metrics.stage('resample'):
+            image.thumbnail(box, Image.Resampling.LANCZOS)
+        if orientation != 1:
+            # 전체 크기가 아니라 축소가 끝난 이미지만 돌림
+            with metrics.stage('orient'):
+                image = image.transpose(EXIF_TRANSPOSE[orientation])
+        return image
+
+
+def decode_into_shared_memory(image_path, box, memory_name):
+    """(작업 프로세스) 디코딩/축소한 픽셀을 부모가 만든 공유 메모리에 쓰고 (모드, 크기, 바이트 수) 반환"""
+    from multiprocessing import shared_memory
+    image = load_display_image(image_path, box)
+    if image.mode not in DecodeEngine.SHARED_MODES:
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    data = image.tobytes()
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        memory.buf[:len(data)] = data
+    finally:
+        memory.close()
+    return image.mode, image.size, len(data)
+
+
+class DecodeEngine:
+    """파일 크기와 형식에 따라 디코딩 실행 위치 선택
+    
+    - inline: 호출한 스레드에서 바로 (작은 파일은 넘기는 비용이 더 큼)
+    - thread: 디코딩 전용 스레드 풀 (Pillow가 GIL을 놓는 JPEG 등)
+    - process: 프로세스 풀 (큰 TIFF/PNG/WebP처럼 GIL을 오래 잡는 형식)
+    
+    프로세스 풀 결과는 pickle 대신 부모가 만든 공유 메모리로 받는다.
+    """
+
+    HEAVY_FORMATS = {'.tif', '.tiff', '.png', '.webp', '.bmp'}
+    SHARED_MODES = ('RGB', 'RGBA', 'L')
+    MODES = ('auto', 'inline', 'thread', 'process')
+
+    def __init__(self, mode='auto', inline_max_bytes=512 * 1024,
+                 process_min_bytes=8 * 1024 * 1024, thread_workers=2, process_workers=None):
+        self.mode = mode if mode in self.MODES else 'auto'
+        self.inline_max_bytes = inline_max_bytes
+        self.process_min_bytes = process_min_bytes
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.thread_pool = None
+        self.process_pool = None
+        self.process_failed = False
+        self.lock = threading.Lock()
+    
+    def choose(self, image_path):
+        """image_path를 디코딩할 방식"""
+        if self.mode != 'auto':
+            mode = self.mode
+        else:
+            size = os.path.getsize(image_path)
+            suffix = os.path.splitext(image_path)[1].lower()
+            if size <= self.inline_max_bytes:
+                mode = 'inline'
+            elif suffix in self.HEAVY_FORMATS and size >= self.process_min_bytes:
+                mode = 'process'
+            else:
+                mode = 'thread'
+        if mode == 'process' and self.process_failed:
+            mode = 'thread'
+        return mode
+    
+    def load(self, image_path, box, metrics=NO_METRICS):
+        """box 크기로 줄인 PIL 이미지 반환 (호출한 스레드는 결과가 나올 때까지 대기)"""
+        mode = self.choose(image_path)
+        metrics.count('decode_' + mode)
+        if mode == 'process':
+            try:
+                return self._load_in_process(image_path, box, metrics)
+            except BrokenExecutor as e:
+                print(f"디코딩 프로세스 사용 불가, 스레드로 전환합니다: {e}")
+                self.process_failed = True
+                mode = 'thread'
+        if mode == 'thread':
+            return self._get_thread_pool().submit(load_display_image, image_path, box,
+                                                  metrics).result()
+        return load_display_image(image_path, box, metrics)
+    
+    def _get_thread_pool(self):
+        with self.lock:
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers,
+                                                      thread_name_prefix="decode")
+            return self.thread_pool
+    
+    def _get_process_pool(self):
+        with self.lock:
+            if self.process_pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # 윈도우와 같은 방식(spawn)으로 통일해 Tk 상태를 복사하지 않음
+                self.process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context('spawn'))
+            return self.process_pool
+    
+    def _load_in_process(self, image_path, box, metrics):
+        from multiprocessing import shared_memory
+        # 결과는 box 이하 크기이므로 RGBA 기준으로 미리 할당
+        memory = shared_memory.SharedMemory(create=True, size=box[0] * box[1] * 4)
+        try:
+            with metrics.stage('process_decode'):
+                mode, size, length = self._get_process_pool().submit(
+                    decode_into_shared_memory, image_path, box, memory.name).result()
+            with memory.buf[:length] as view:
+                return Image.frombytes(mode, size, view)
+        finally:
+            memory.close()
+            memory.unlink()
+    
+    def shutdown(self):
+        """풀 종료"""
+        with self.lock:
+            if self.thread_pool:
+                self.thread_pool.shutdown(wait=False, cancel_futures=True)
+                self.thread_pool = None
+            if self.process_pool:
+                self.process_pool.shutdown(wait=False, cancel_futures=True)
+                self.process_pool = None
+
+
+class StorageUnavailable(Exception):
+    """공유 폴더가 제한 시간 안에 응답하지 않거나 연결이 끊김 (파일 자체의 문제가 아님)"""
+
+
+class LocalFiles:
+    """원본 사진 파일 접근 (로컬 디스크에서 바로)
+    
+    SlowStorage와 같은 메서드를 가지므로 폴더 인덱스와 캐시는 둘 중 무엇을
+    받아도 같게 동작한다. 벤치마크는 이를 상속해 지연을 넣은 가짜 파일
+    시스템으로 쓴다.
+    """
+
+    def stat(self, path):
+        return os.stat(path)
+    
+    def read(self, path):
+        """파일 전체 내용"""
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    def open(self, path):
+        """읽기용 바이너리 파일 객체"""
+        return open(path, 'rb')
+    
+    def read_head(self, path, size):
+        """파일 앞부분 size바이트"""
+        with open(path, 'rb') as f:
+            return f.read(size)
+    
+    def read_tail(self, path, size):
+        """파일 끝부분 size바이트 (파일이 더 작으면 전체)"""
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - size))
+            return f.read()
+    
+    def open_head(self, path):
+        """헤더를 읽을 파일 객체 (로컬은 파일 전체를 그대로)"""
+        return open(path, 'rb')
+    
+    def list_dir(self, path):
+        """디렉터리 항목 [(이름, 디렉터리 여부)] (정보를 읽을 수 없는 항목은 제외)"""
+        result = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    result.append((entry.name, entry.is_dir(follow_symlinks=False)))
+                except OSError:
+                    continue
+        return result
+
+
+LOCAL_FILES = LocalFiles()
+
+# 네트워크 파일 시스템 (/proc/mounts의 형식 이름)
+NETWORK_FS_TYPES = {'cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'afpfs', 'davfs', '9p',
+                    'fuse.sshfs', 'fuse.rclone'}
+
+
+def is_network_path(path):
+    """네트워크 공유 폴더(UNC 경로, 네트워크 드라이브, SMB/NFS 마운트)이면 True"""
+    path = os.path.abspath(path)
+    if path.startswith(('\\\\', '//')):
+        return True
+    if os.name == 'nt':
+        import ctypes
+        drive = os.path.splitdrive(path)[0]
+        DRIVE_REMOTE = 4
+        return bool(drive) and ctypes.windll.kernel32.GetDriveTypeW(drive + '\\') == DRIVE_REMOTE
+    try:
+        with open('/proc/mounts', 'r', encoding='utf-8') as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return False
+    # path를 포함하는 가장 긴 마운트 지점의 형식
+    best, fs_type = '', ''
+    for fields in mounts:
+        if len(fields) < 3:
+            continue
+        mount_point = fields[1].replace('\\040', ' ')
+        inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+        if inside and len(mount_point) > len(best):
+            best, fs_type = mount_point, fields[2]
+    return fs_type in NETWORK_FS_TYPES
+
+
+class SlowStorage:
+    """느리거나 끊길 수 있는 저장소(SMB/NFS 공유 폴더)의 원본 파일 접근 계층
+    
+    모든 접근은 정해진 수의 읽기 스레드에서 실행하고, 호출한 쪽은 timeout초까지만
+    기다린다. 응답이 없거나 네트워크 오류가 나면 retry_seconds 동안 오프라인으로
+    보고 바로 StorageUnavailable을 낸다 (그동안 위젯은 캐시된 이미지로 표시).
+    파일은 통째로 한 번에 읽어 메모리에서 디코딩하므로 작은 읽기가 여러 번
+    오가지 않고, read_ahead()로 다음 사진들을 미리 읽어 둘 수 있다. 파일 전체
+    읽기는 CHUNK_BYTES씩 받으므로 제한 시간은 조각마다 적용한다 (큰 파일을
+    느린 연결로 받는 중에는 끊긴 것으로 보지 않음).
+    읽기 스레드는 데몬이라 멈춘 읽기가 있어도 프로그램 종료를 막지 않는다.
+    """
+
+    # 연결 문제로 보는 오류 (파일이 없거나 권한이 없는 것은 그 파일만의 문제)
+    NETWORK_ERRNOS = {getattr(errno, name) for name in (
+        'ETIMEDOUT', 'EHOSTDOWN', 'EHOSTUNREACH', 'ENETDOWN', 'ENETUNREACH',
+        'ENETRESET', 'ECONNRESET', 'ECONNABORTED', 'ESTALE', 'EIO') if hasattr(errno, name)}
+    # 윈도우: 네트워크 경로/이름 없음, 연결 끊김, 세마포 시간 초과, 위치에 연결할 수 없음 등
+    NETWORK_WINERRORS = {51, 53, 54, 59, 64, 67, 121, 1231}
+    # 헤더 정보를 읽을 때 가져올 앞부분 (EXIF와 미리보기 썸네일을 지나 크기 정보까지)
+    HEAD_BYTES = 256 * 1024
+    CHUNK_BYTES = 1024 * 1024
+
+    def __init__(self, files=None, timeout=5.0, readers=4,
+                 read_ahead_bytes=64 * 1024 * 1024, retry_seconds=30):
+        self.files = files or LOCAL_FILES
+        self.timeout = timeout
+        self.readers = max(1, readers)
+        self.read_ahead_bytes = read_ahead_bytes
+        self.retry_seconds = retry_seconds
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        # 경로 -> 미리 읽은 파일 내용 (오래된 것이 앞쪽)
+        self.buffers = OrderedDict()
+        self.buffered_bytes = 0
+        self.pending = {}  # 경로 -> 미리 읽는 중인 (Future, 진행 기록)
+        self.offline_until = 0.0
+        self.timeouts = 0
+        for number in range(self.readers):
+            threading.Thread(target=self._worker, name=f"storage-{number}",
+                             daemon=True).start()
+    
+    @property
+    def online(self):
+        return time.monotonic() >= self.offline_until
+    
+    def stat(self, path):
+        return self.call(self.files.stat, path)
+    
+    def list_dir(self, path):
+        return self.call(self.files.list_dir, path)
+    
+    def read(self, path):
+        """파일 전체 내용 (미리 읽어 둔 것이 있으면 그것을, 읽는 중이면 기다림)"""
+        with self.lock:
+            data = self.buffers.get(path)
+            if data is not None:
+                self.buffers.move_to_end(path)
+                return data
+            pending = self.pending.get(path)
+        self._check_online()
+        if pending is None or pending[0].cancelled():
+            progress = [time.monotonic()]
+            data = self._wait(self._submit(self._read_whole, path, progress), progress)
+            return self._keep(path, data)
+        return self._wait(*pending)
+    
+    def read_head(self, path, size):
+        """파일 앞부분 size바이트 (미리 읽어 둔 것이 있으면 거기서)"""
+        with self.lock:
+            data = self.buffers.get(path)
+        if data is not None:
+            return data[:size]
+        return self.call(self.files.read_head, path, size)
+    
+    def read_tail(self, path, size):
+        """파일 끝부분 size바이트 (미리 읽어 둔 것이 있으면 거기서)"""
+        with self.lock:
+            data = self.buffers.get(path)
+        if data is not None:
+            return data[-size:]
+        return self.call(self.files.read_tail, path, size)
+    
+    def open(self, path):
+        """읽기용 바이너리 파일 객체 (메모리에 읽어 둔 내용)"""
+        return io.BytesIO(self.read(path))
+    
+    def open_head(self, path):
+        """헤더(크기, EXIF)만 읽을 파일 객체 - 파일 전체 대신 앞부분 HEAD_BYTES만 가져옴"""
+        return io.BytesIO(self.read_head(path, self.HEAD_BYTES))
+    
+    def call(self, function, *args):
+        """function(*args)를 읽기 스레드에서 실행하고 timeout초까지만 기다려 결과 반환"""
+        self._check_online()
+        return self._wait(self._submit(function, *args))
+    
+    def read_ahead(self, paths):
+        """paths를 통째로 미리 읽기 시작 (기다리지 않음, 오프라인이면 무시)
+        
+        읽기 스레드 하나는 화면에 필요한 접근을 위해 비워 둔다.
+        """
+        if not self.online:
+            return
+        started = []
+        with self.lock:
+            for path in paths:
+                if len(self.pending) >= max(1, self.readers - 1):
+                    break
+                if path in self.buffers or path in self.pending:
+                    continue
+                progress = [time.monotonic()]
+                future = self._submit(self._read_ahead_one, path, progress)
+                self.pending[path] = (future, progress)
+                started.append((path, future))
+        # 끝나거나 취소되면 (대기열에서 시간 초과 등) 바로 목록에서 뺌 (잠금 밖에서 등록:
+        # 이미 끝났으면 여기서 바로 불림)
+        for path, future in started:
+            future.add_done_callback(lambda future, path=path: self._forget(path, future))
+    
+    def is_network_error(self, error):
+        return (error.errno in self.NETWORK_ERRNOS
+                or getattr(error, 'winerror', None) in self.NETWORK_WINERRORS)
+    
+    def _read_whole(self, path, progress):
+        """(읽기 스레드) 파일 전체를 조각씩 읽으며 progress[0]에 마지막으로 받은 시각 기록"""
+        chunks = []
+        with self.files.open(path) as f:
+            while True:
+                chunk = f.read(self.CHUNK_BYTES)
+                progress[0] = time.monotonic()
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return b"".join(chunks)
+    
+    def _read_ahead_one(self, path, progress):
+        return self._keep(path, self._read_whole(path, progress))
+    
+    def _forget(self, path, future):
+        """미리 읽기 목록에서 path를 뺌 (그 사이 같은 경로로 새로 시작한 것은 그대로)"""
+        with self.lock:
+            pending = self.pending.get(path)
+            if pending is not None and pending[0] is future:
+                del self.pending[path]
+    
+    def _keep(self, path, data):
+        """읽은 내용을 예산 안에서 보관 (넘치면 오래된 것부터 버림)"""
+        if len(data) > self.read_ahead_bytes // 2:
+            return data
+        with self.lock:
+            if path not in self.buffers:
+                self.buffers[path] = data
+                self.buffered_bytes += len(data)
+            while self.buffered_bytes > self.read_ahead_bytes and self.buffers:
+                _, old = self.buffers.popitem(last=False)
+                self.buffered_bytes -= len(old)
+        return data
+    
+    def _submit(self, function, *args):
+        future = Future()
+        self.jobs.put((future, function, args))
+        return future
+    
+    def _worker(self):
+        while True:
+            future, function, args = self.jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(*args))
+            except BaseException as e:
+                future.set_exception(e)
+    
+    def _wait(self, future, progress=None):
+        """결과를 기다림 (progress가 있으면 마지막 진행 뒤로 timeout초까지)"""
+        try:
+            while True:
+                try:
+                    if progress is None:
+                        result = future.result(self.timeout)
+                    else:
+                        result = future.result(max(0.0, progress[0] + self.timeout - time.monotonic()))
+                    break
+                except FutureTimeout:
+                    if progress is None or time.monotonic() - progress[0] >= self.timeout:
+                        raise
+        except FutureTimeout:
+            # 아직 대기열에 있으면 실행하지 않음 (이미 멈춘 읽기는 스레드 하나를 계속 차지)
+            future.cancel()
+            self._forget_future(future)
+            self.timeouts += 1
+            raise self._went_offline(f"{self.timeout}초 동안 응답 없음")
+        except CancelledError as e:
+            # 다른 쪽이 기다리다 시간 초과로 취소한 미리 읽기
+            raise StorageUnavailable("미리 읽기가 취소됨") from e
+        except OSError as e:
+            if self.is_network_error(e):
+                raise self._went_offline(str(e)) from e
+            raise
+        if self.offline_until:
+            with self.lock:
+                self.offline_until = 0.0
+            print("공유 폴더에 다시 연결되었습니다")
+        return result
+    
+    def _forget_future(self, future):
+        """시간 초과된 future가 미리 읽기였으면 목록에서 뺌 (연결이 돌아오면 다시 읽도록)"""
+        with self.lock:
+            for path, pending in list(self.pending.items()):
+                if pending[0] is future:
+                    del self.pending[path]
+    
+    def _check_online(self):
+        if not self.online:
+            raise StorageUnavailable("공유 폴더 연결 끊김 (다시 시도 대기 중)")
+    
+    def _went_offline(self, reason):
+        with self.lock:
+            was_online = self.online
+            self.offline_until = time.monotonic() + self.retry_seconds
+        if was_online:
+            print(f"공유 폴더 응답 없음, {self.retry_seconds}초 동안 캐시된 이미지로 표시합니다: "
+                  f"{reason}")
+        return StorageUnavailable(reason)
+
+
+class PyramidCache:
+    """사진마다 여러 해상도(긴 변 256/512/1024/2048)를 한 파일에 담아 두는 디스크 캐시
+    
+    위젯 크기가 바뀌어도 원본 대신 요청한 크기를 덮는 가장 작은 단계에서
+    축소한다. 단계는 필요할 때 만들고(작은 단계는 큰 단계에서 파생),
+    내용이 같은 사진(복사본)은 파일 하나를 함께 쓴다. 총 용량을 넘으면
+    오래 쓰지 않은 파일부터 삭제한다.
+    
+    파일 형식: MAGIC + 헤더 길이(4바이트) + JSON 헤더 + 단계별 JPEG/PNG 데이터
+    (full과 단계 이미지는 EXIF 방향을 적용한 기준)
+    """
+
+    LEVELS = (256, 512, 1024, 2048)
+    # 2: 단계 이미지를 EXIF 방향대로 세워 저장 (이전 형식 파일은 인덱스와 함께 정리됨)
+    MAGIC = b"PWPYR2\n"
+    INDEX_NAME = "pyramid_index2.json"
+    FINGERPRINT_BYTES = 64 * 1024
+    # 인덱스에 없는 파일을 지우기 전에 기다리는 시간 (함께 실행 중인 --warm-cache는
+    # 50개마다 인덱스를 저장하므로 그보다 오래된 파일만 버려진 것으로 봄)
+    ORPHAN_GRACE_SECONDS = 24 * 60 * 60
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, load=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, self.INDEX_NAME)
+        # 내용 키 -> {'file': 파일명, 'bytes': 크기, 'full': [너비, 높이], 'levels': [긴 변...]}
+        # 오래 사용하지 않은 항목이 앞쪽
+        self.entries = OrderedDict()
+        # 원본 경로 -> {'key': 경로/크기/수정 시각 키, 'content': 내용 키}
+        self.sources = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.unsaved_puts = 0
+        # 인덱스를 다 읽기 전에는 캐시를 쓰지 않고 기다림 (load=False면 load_index()를 따로 호출)
+        self.ready = threading.Event()
+        
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        if load:
+            self.load_index()
+    
+    @staticmethod
+    def source_name(image_path):
+        return os.path.normcase(os.path.abspath(image_path))
+    
+    @staticmethod
+    def make_key(image_path, stat):
+        """원본 경로, 크기, 수정 시각으로 원본 키 생성"""
+        raw = f"{PyramidCache.source_name(image_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def fingerprint(cls, image_path, stat, files=LOCAL_FILES):
+        """파일 크기와 앞뒤 일부 내용으로 만든 내용 키 (복사본은 같은 키)
+        
+        파일 전체가 아니라 앞뒤 FINGERPRINT_BYTES만 읽는다.
+        """
+        head = files.read_head(image_path, cls.FINGERPRINT_BYTES)
+        tail = b""
+        if stat.st_size > 2 * cls.FINGERPRINT_BYTES:
+            tail = files.read_tail(image_path, cls.FINGERPRINT_BYTES)
+        return cls._fingerprint_parts(stat.st_size, head, tail)
+    
+    @classmethod
+    def fingerprint_data(cls, data):
+        """메모리에 읽어 둔 파일 내용으로 fingerprint()와 같은 키 계산"""
+        size = len(data)
+        head = data[:cls.FINGERPRINT_BYTES]
+        tail = data[-cls.FINGERPRINT_BYTES:] if size > 2 * cls.FINGERPRINT_BYTES else b""
+        return cls._fingerprint_parts(size, head, tail)
+    
+    @staticmethod
+    def _fingerprint_parts(size, head, tail):
+        digest = hashlib.sha1(str(size).encode('ascii'))
+        digest.update(head)
+        digest.update(tail)
+        return digest.hexdigest()
+    
+    def read_index_file(self):
+        """디스크의 캐시 인덱스 내용 (없으면 None)"""
+        if not os.path.exists(self.index_file):
+            return None
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def load_index(self):
+        """캐시 인덱스 로드 (인덱스에 없는 오래된 파일은 정리)"""
+        try:
+            data = self.read_index_file()
+            if data is not None:
+                for key, entry in data['entries']:
+                    if os.path.exists(os.path.join(self.cache_dir, entry['file'])):
+                        self.entries[key] = entry
+                        self.total_bytes += entry['bytes']
+                self.sources = {path: source for path, source in data['sources'].items()
+                                if source['content'] in self.entries}
+        except Exception as e:
+            print(f"캐시 인덱스 로드 실패: {e}")
+            self.entries.clear()
+            self.sources = {}
+            self.total_bytes = 0
+        
+        try:
+            # 최근 파일은 다른 프로세스(--warm-cache 등)가 아직 인덱스에 저장하지 않은 것일 수 있음
+            cutoff = time.time() - self.ORPHAN_GRACE_SECONDS
+            known = {entry['file'] for entry in self.entries.values()}
+            known.add(self.INDEX_NAME)
+            for name in os.listdir(self.cache_dir):
+                if name in known:
+                    continue
+                try:
+                    if os.path.getmtime(os.path.join(self.cache_dir, name)) >= cutoff:
+                        continue
+                except OSError:
+                    continue
+                self._remove_file(name)
+        finally:
+            # 백그라운드에서 읽는 중 실패해도 기다리는 쪽이 멈추지 않게
+            self.ready.set()
+    
+    def save_index(self):
+        """캐시 인덱스 저장 (LRU 순서 유지)
+        
+        그 사이 다른 프로세스(--warm-cache 등)가 저장한 항목은 합쳐서 남긴다.
+        """
+        if not self.ready.is_set():
+            return
+        try:
+            on_disk = self.read_index_file()
+        except Exception as e:
+            print(f"캐시 인덱스 로드 실패: {e}")
+            on_disk = None
+        with self.lock:
+            if on_disk is not None:
+                self._merge_index(on_disk)
+            # 삭제된 피라미드를 가리키는 원본 정보는 저장하지 않음
+            sources = {path: source for path, source in self.sources.items()
+                       if source['content'] in self.entries}
+            self.sources = sources
+            data = {'entries': list(self.entries.items()), 'sources': sources}
+            self.unsaved_puts = 0
+        try:
+            # 다른 프로세스와 임시 파일이 겹치지 않게
+            temp_file = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+        except Exception as e:
+            print(f"캐시 인덱스 저장 실패: {e}")
+    
+    def _merge_index(self, data):
+        """디스크 인덱스에만 있고 파일도 남아 있는 항목을 가져옴 (lock을 잡은 상태에서 호출)
+        
+        여기서 용량 때문에 지운 항목은 파일이 없으므로 다시 들어오지 않는다.
+        """
+        merged = []
+        for key, entry in data['entries']:
+            if key not in self.entries and os.path.exists(os.path.join(self.cache_dir, entry['file'])):
+                merged.append((key, entry))
+        # 언제 썼는지 알 수 없으므로 가장 오래 사용하지 않은 쪽에 둠
+        for key, entry in reversed(merged):
+            self.entries[key] = entry
+            self.entries.move_to_end(key, last=False)
+            self.total_bytes += entry['bytes']
+        for path, source in data['sources'].items():
+            if path not in self.sources and source['content'] in self.entries:
+                self.sources[path] = source
+    
+    def choose_level(self, full_size, box):
+        """box에 맞춘 크기를 덮는 가장 작은 단계 (없으면 None: 원본 필요)"""
+        target = fit_size(full_size, box)
+        for edge in self.LEVELS:
+            size = fit_size(full_size, (edge, edge))
+            if size[0] >= target[0] and size[1] >= target[1]:
+                return edge
+        return None
+    
+    def render(self, image_path, box, decode, metrics=NO_METRICS, exact=True,
+               files=LOCAL_FILES):
+        """box 안에 맞춘 이미지 반환
+        
+        decode(경로, box)는 원본을 box 크기로 줄여 읽는 함수로, 단계가 없을 때만
+        호출한다. exact=False이면 축소하지 않고 고른 단계 이미지를 그대로 반환.
+        원본 파일 정보와 내용은 files(LocalFiles/SlowStorage)를 통해 읽는다.
+        """
+        self.ready.wait()
+        stat = files.stat(image_path)
+        source_key = self.make_key(image_path, stat)
+        source_name = self.source_name(image_path)
+        with self.lock:
+            source = self.sources.get(source_name)
+            entry = None
+            if source and source['key'] == source_key:
+                entry = self.entries.get(source['content'])
+        
+        if entry is None:
+            # 원본이 바뀌었거나 처음 보는 파일: 내용이 같은 복사본의 피라미드가 있는지 확인
+            content_key = self.fingerprint(image_path, stat, files)
+            with self.lock:
+                self.sources[source_name] = {'key': source_key, 'content': content_key}
+                entry = self.entries.get(content_key)
+            if entry is None:
+                full_size = self.full_size_of(image_path, files)
+                entry = {'file': content_key + ".pyr", 'bytes': 0,
+                         'full': list(full_size), 'levels': []}
+        else:
+            content_key = source['content']
+        
+        edge = self.choose_level(tuple(entry['full']), box)
+        if edge is None:
+            # 피라미드보다 큰 요청은 원본에서 바로
+            metrics.count('pyramid_bypass')
+            return decode(image_path, box)
+        
+        image = None
+        if edge in entry['levels']:
+            with metrics.stage('cache_read'):
+                image = self._read_level(entry, edge)
+        if image is None:
+            metrics.count('cache_miss')
+            image = self._build_levels(image_path, content_key, entry, edge, decode, metrics)
+        else:
+            metrics.count('cache_hit')
+            with self.lock:
+                if content_key in self.entries:
+                    self.entries.move_to_end(content_key)
+        
+        if not exact:
+            return image
+        target = fit_size(tuple(entry['full']), box)
+        if image.size != target:
+            with metrics.stage('resample'):
+                image = image.resize(target, Image.Resampling.LANCZOS)
+        return image
+    
+    @staticmethod
+    def full_size_of(image_path, files):
+        """방향을 적용한 원본 크기 (헤더만 읽고, 앞부분에 헤더가 다 없으면 파일 전체에서)"""
+        try:
+            with files.open_head(image_path) as f, Image.open(f) as image:
+                return oriented_size(image)
+        except (OSError, SyntaxError, ValueError):
+            # TIFF 등은 정보가 파일 끝쪽에 있을 수 있음
+            with files.open(image_path) as f, Image.open(f) as image:
+                return oriented_size(image)
+    
+    def render_cached(self, image_path, box, exact=True):
+        """원본에 접근하지 않고 캐시에 있는 단계만으로 만든 이미지 (없으면 None)
+        
+        공유 폴더가 끊겼을 때 쓰므로 원본이 바뀌었는지는 확인하지 않고, 알맞은
+        단계가 없으면 있는 것 중 가장 큰 단계를 늘려서라도 보여 준다.
+        """
+        self.ready.wait()
+        with self.lock:
+            source = self.sources.get(self.source_name(image_path))
+            entry = self.entries.get(source['content']) if source else None
+        if entry is None or not entry['levels']:
+            return None
+        wanted = self.choose_level(tuple(entry['full']), box)
+        levels = sorted(entry['levels'])
+        edge = next((level for level in levels if wanted and level >= wanted), levels[-1])
+        image = self._read_level(entry, edge)
+        if image is None or not exact:
+            return image
+        target = fit_size(tuple(entry['full']), box)
+        if image.size != target:
+            image = image.resize(target, Image.Resampling.LANCZOS)
+        return image
+    
+    def is_cached(self, image_path):
+        """원본 경로에 대한 피라미드가 있으면 True (원본은 확인하지 않음)"""
+        with self.lock:
+            source = self.sources.get(self.source_name(image_path))
+            return source is not None and source['content'] in self.entries
+    
+    def _read_level(self, entry, edge):
+        """피라미드 파일에서 한 단계만 읽기"""
+        try:
+            with open(os.path.join(self.cache_dir, entry['file']), 'rb') as f:
+                header = self._read_header(f)
+                data_start = f.tell()
+                for level in header['levels']:
+                    if level['edge'] == edge:
+                        f.seek(data_start + level['offset'])
+                        with Image.open(io.BytesIO(f.read(level['length']))) as image:
+                            image.load()
+                            return image
+        except Exception as e:
+            print(f"캐시 파일 읽기 실패: {entry['file']}, 오류: {e}")
+        return None
+    
+    @classmethod
+    def _read_header(cls, f):
+        if f.read(len(cls.MAGIC)) != cls.MAGIC:
+            raise ValueError("피라미드 파일 형식이 아님")
+        length = int.from_bytes(f.read(4), 'little')
+        return json.loads(f.read(length).decode('utf-8'))
+    
+    def _build_levels(self, image_path, content_key, entry, edge, decode, metrics):
+        """원본을 edge 단계 크기로 한 번 읽고, 없는 더 작은 단계는 거기서 파생해 저장"""
+        base = decode(image_path, (edge, edge))
+        levels = self.derive_levels(base, edge, entry['levels'])
+        
+        try:
+            with metrics.stage('cache_write'):
+                target = os.path.join(self.cache_dir, entry['file'])
+                size, edges = self.write_container(target, entry['full'], levels)
+                self.register(content_key, entry, size, edges)
+        except Exception as e:
+            print(f"캐시 저장 실패: {image_path}, 오류: {e}")
+        return base
+    
+    @classmethod
+    def derive_levels(cls, base, edge, existing=()):
+        """edge 단계 이미지와, 거기서 줄여 만든 없는 더 작은 단계들"""
+        levels = {edge: base}
+        for smaller in cls.LEVELS:
+            if smaller < edge and smaller not in existing:
+                image = base.copy()
+                image.thumbnail((smaller, smaller), Image.Resampling.LANCZOS)
+                levels[smaller] = image
+        return levels
+    
+    @classmethod
+    def write_container(cls, target, full_size, new_levels):
+        """기존 단계와 새 단계를 합쳐 피라미드 파일을 다시 쓰고 (파일 크기, 단계 목록) 반환"""
+        blobs = {}
+        if os.path.exists(target):
+            try:
+                with open(target, 'rb') as f:
+                    header = cls._read_header(f)
+                    data_start = f.tell()
+                    for level in header['levels']:
+                        f.seek(data_start + level['offset'])
+                        blobs[level['edge']] = (level['format'], f.read(level['length']))
+            except (OSError, ValueError) as e:
+                print(f"기존 캐시 파일을 무시합니다: {target}, 오류: {e}")
+                blobs = {}
+        for edge, image in new_levels.items():
+            buffer = io.BytesIO()
+            if image.mode in ('RGB', 'L'):
+                image.save(buffer, format='JPEG', quality=90)
+                blobs[edge] = ('JPEG', buffer.getvalue())
+            else:
+                image.save(buffer, format='PNG')
+                blobs[edge] = ('PNG', buffer.getvalue())
+        
+        # 오프셋은 헤더 바로 뒤(데이터 시작)부터의 상대 위치
+        levels = []
+        offset = 0
+        for edge in sorted(blobs):
+            fmt, blob = blobs[edge]
+            levels.append({'edge': edge, 'format': fmt, 'offset': offset, 'length': len(blob)})
+            offset += len(blob)
+        header_bytes = json.dumps({'full': list(full_size), 'levels': levels}).encode('utf-8')
+        
+        # 같은 사진을 두 스레드(또는 프로세스)가 동시에 만들 수도 있으므로 임시 파일 이름을 따로
+        temp_file = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(cls.MAGIC)
+            f.write(len(header_bytes).to_bytes(4, 'little'))
+            f.write(header_bytes)
+            for edge in sorted(blobs):
+                f.write(blobs[edge][1])
+        os.replace(temp_file, target)
+        return os.path.getsize(target), sorted(blobs)
+    
+    def register(self, content_key, entry, size, edges, source_name=None, source_key=None):
+        """새로 쓴 피라미드 파일을 인덱스에 등록하고 용량 초과분 삭제"""
+        with self.lock:
+            old = self.entries.pop(content_key, None)
+            if old:
+                self.total_bytes -= old['bytes']
+            self.entries[content_key] = dict(entry, bytes=size, levels=edges)
+            self.total_bytes += size
+            if source_name is not None:
+                self.sources[source_name] = {'key': source_key, 'content': content_key}
+            
+            # 용량 초과시 가장 오래 사용하지 않은 항목부터 삭제
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                self._discard(next(iter(self.entries)))
+            
+            self.unsaved_puts += 1
+            save_now = self.unsaved_puts >= 50
+        if save_now:
+            self.save_index()
+    
+    def has_level(self, image_path, stat, edge):
+        """image_path의 피라미드에 edge 단계까지 이미 있으면 True (원본이 바뀌었으면 False)"""
+        self.ready.wait()
+        with self.lock:
+            source = self.sources.get(self.source_name(image_path))
+            if not source or source['key'] != self.make_key(image_path, stat):
+                return False
+            entry = self.entries.get(source['content'])
+            return entry is not None and edge in entry['levels']
+    
+    def _discard(self, key):
+        """항목과 파일 삭제 (lock을 잡은 상태에서 호출)"""
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.total_bytes -= entry['bytes']
+            self._remove_file(entry['file'])
+    
+    def _remove_file(self, name):
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+
+class CatalogColumns:
+    """폴더의 이미지 경로를 압축해서 보관하는 열(column) 저장소 (같은 폴더를 보는 창끼리 공유)
+    
+    경로마다 전체 문자열을 두지 않고 (디렉터리 번호, 이름, 확장자 번호)로 나눠
+    저장한다. 디렉터리 경로는 테이블에 한 번만, 이름은 UTF-8로 이어 붙인
+    bytearray에, 나머지는 array 열에 둔다. 삭제된 파일은 항목 번호가 바뀌지
+    않도록 live 표시만 끄고, 창마다의 표시 순서와 필터는 ImageCatalog가 항목
+    번호로 따로 가진다.
+    """
+
+    # 파일로 저장하는 array 열
+    COLUMNS = ('name_start', 'name_length', 'entry_dir', 'entry_suffix', 'live')
+    MAGIC = b"PWCOL1\n"
+    # 옛 번호 -> 새 번호 표에서 삭제된 항목
+    DEAD = 0xFFFFFFFF
+
+    def __init__(self):
+        self.dirs = []          # 디렉터리 번호 -> 경로
+        self.dir_ids = {}       # 경로 -> 디렉터리 번호
+        self.suffixes = []      # 확장자 번호 -> 확장자 ('.jpg' 등)
+        self.suffix_ids = {}
+        self.names = bytearray()        # 확장자를 뺀 이름들을 이어 붙인 것
+        self.name_start = array('I')    # 항목별 이름 시작 위치
+        self.name_length = array('H')   # 항목별 이름 길이 (바이트)
+        self.entry_dir = array('I')     # 항목별 디렉터리 번호
+        self.entry_suffix = array('H')  # 항목별 확장자 번호
+        self.live = array('B')          # 항목별 1: 폴더에 있음, 0: 삭제됨
+        self.live_count = 0
+        # 이 열이 반영하는 폴더 인덱스의 디렉터리 수정 시각 (다음 시작 때 바뀐 디렉터리만 비교)
+        self.dir_mtimes = {}
+        # 항목 번호를 새로 매길 때마다 바뀜 (저장된 창별 순서가 이 열의 것인지 확인)
+        self.token = random.getrandbits(48)
+    
+    def __len__(self):
+        """항목 수 (삭제된 항목 포함)"""
+        return len(self.entry_dir)
+    
+    def path_of(self, entry):
+        """항목 번호의 전체 경로"""
+        return os.path.join(self.dirs[self.entry_dir[entry]], self.file_name(entry))
+    
+    def file_name(self, entry):
+        """항목 번호의 파일 이름 (디렉터리 제외)"""
+        start = self.name_start[entry]
+        name = self.names[start:start + self.name_length[entry]].decode('utf-8', 'surrogateescape')
+        return name + self.suffixes[self.entry_suffix[entry]]
+    
+    def _split(self, image_path):
+        directory, filename = os.path.split(image_path)
+        stem, suffix = os.path.splitext(filename)
+        return directory, stem.encode('utf-8', 'surrogateescape'), suffix
+    
+    def _intern(self, table, ids, value):
+        number = ids.get(value)
+        if number is None:
+            number = ids[value] = len(table)
+            table.append(value)
+        return number
+    
+    def add(self, image_path):
+        """경로를 새 항목으로 추가하고 항목 번호 반환"""
+        directory, stem, suffix = self._split(image_path)
+        entry = len(self.entry_dir)
+        self.entry_dir.append(self._intern(self.dirs, self.dir_ids, directory))
+        self.entry_suffix.append(self._intern(self.suffixes, self.suffix_ids, suffix))
+        self.name_start.append(len(self.names))
+        self.name_length.append(len(stem))
+        self.names += stem
+        self.live.append(1)
+        self.live_count += 1
+        return entry
+    
+    def add_directory(self, directory, filenames):
+        """한 디렉터리의 파일들을 한꺼번에 추가 (경로를 하나씩 나누는 것보다 빠름)"""
+        dir_id = self._intern(self.dirs, self.dir_ids, directory)
+        stems = []
+        for filename in filenames:
+            stem, suffix = os.path.splitext(filename)
+            stems.append(stem.encode('utf-8', 'surrogateescape'))
+            self.entry_suffix.append(self._intern(self.suffixes, self.suffix_ids, suffix))
+        if not stems:
+            return
+        # 나머지 열은 디렉터리 단위로 한 번에
+        lengths = list(map(len, stems))
+        self.name_start.extend(accumulate(lengths[:-1], initial=len(self.names)))
+        self.name_length.extend(lengths)
+        self.names += b"".join(stems)
+        self.entry_dir.extend(repeat(dir_id, len(stems)))
+        self.live.extend(repeat(1, len(stems)))
+        self.live_count += len(stems)
+    
+    def find_live(self, image_paths):
+        """image_paths 중 목록에 있는 경로의 {경로: 항목 번호} (열은 한 번만 훑음)"""
+        targets = {}
+        for image_path in image_paths:
+            directory, stem, suffix = self._split(image_path)
+            dir_id = self.dir_ids.get(directory)
+            suffix_id = self.suffix_ids.get(suffix)
+            if dir_id is not None and suffix_id is not None:
+                targets.setdefault(dir_id, {})[(stem, suffix_id)] = image_path
+        found = {}
+        if not targets:
+            # 처음 보는 디렉터리뿐이면 (첫 스캔 등) 훑을 필요 없음
+            return found
+        in_targets = map(targets.__contains__, self.entry_dir)
+        for entry in compress(range(len(self.entry_dir)), in_targets):
+            if not self.live[entry]:
+                continue
+            start = self.name_start[entry]
+            key = (bytes(self.names[start:start + self.name_length[entry]]),
+                   self.entry_suffix[entry])
+            image_path = targets[self.entry_dir[entry]].get(key)
+            if image_path is not None:
+                found[image_path] = entry
+        return found
+    
+    def add_new(self, image_paths):
+        """목록에 없는 경로만 추가하고 새 항목 번호 목록 반환 (같은 변경을 두 번 받아도 한 번만)"""
+        image_paths = list(dict.fromkeys(image_paths))
+        existing = self.find_live(image_paths)
+        return [self.add(path) for path in image_paths if path not in existing]
+    
+    def remove(self, image_paths):
+        """경로들의 항목을 삭제 표시하고 삭제한 항목 번호 목록 반환"""
+        entries = list(self.find_live(image_paths).values())
+        for entry in entries:
+            self.live[entry] = 0
+        self.live_count -= len(entries)
+        return entries
+    
+    def live_entries(self, count=None):
+        """처음 count개 항목 중 살아 있는 항목 번호 array (None이면 전부)"""
+        if count is None:
+            count = len(self.entry_dir)
+        return array('I', compress(range(count), self.live))
+    
+    def directory_names(self, directories):
+        """directories(정규화한 경로)에 있는 살아 있는 항목의 파일 이름 {디렉터리: {이름, ...}}
+        
+        열은 한 번만 훑는다.
+        """
+        wanted = {}
+        for dir_id, directory in enumerate(self.dirs):
+            directory = os.path.normpath(directory)
+            if directory in directories:
+                wanted[dir_id] = directory
+        found = {directory: set() for directory in directories}
+        if wanted:
+            # 항목마다 파이썬 코드를 돌리지 않도록 해당 디렉터리 항목만 map/compress로 골라냄
+            in_wanted = map(wanted.__contains__, self.entry_dir)
+            for entry in compress(range(len(self.entry_dir)), in_wanted):
+                if self.live[entry]:
+                    found[wanted[self.entry_dir[entry]]].add(self.file_name(entry))
+        return found
+    
+    def needs_compact(self):
+        """삭제된 항목이 살아 있는 항목보다 많은지"""
+        return len(self.entry_dir) > 2 * self.live_count + 1024
+    
+    def compact(self):
+        """삭제된 항목을 빼고 다시 만들어 메모리 회수, 옛 번호 -> 새 번호 array 반환
+        
+        삭제된 항목의 새 번호는 DEAD. 창들의 순서는 ImageCatalog.remap()으로 옮긴다.
+        """
+        mapping = array('I', [self.DEAD]) * len(self.entry_dir)
+        live = CatalogColumns()
+        live.dirs, live.dir_ids = self.dirs, self.dir_ids
+        live.suffixes, live.suffix_ids = self.suffixes, self.suffix_ids
+        for entry in compress(range(len(self.entry_dir)), self.live):
+            start = self.name_start[entry]
+            mapping[entry] = len(live.entry_dir)
+            live.entry_dir.append(self.entry_dir[entry])
+            live.entry_suffix.append(self.entry_suffix[entry])
+            live.name_start.append(len(live.names))
+            live.name_length.append(self.name_length[entry])
+            live.names += self.names[start:start + self.name_length[entry]]
+            live.live.append(1)
+        live.live_count = len(live.entry_dir)
+        live.dir_mtimes = self.dir_mtimes
+        self.__dict__.update(live.__dict__)
+        return mapping
+    
+    def to_bytes(self, extra=None):
+        """파일로 저장할 바이트 (JSON 헤더 + 이름 + array 열을 그대로)"""
+        header = json.dumps({
+            'dirs': self.dirs, 'suffixes': self.suffixes, 'names': len(self.names),
+            'columns': [[name, getattr(self, name).typecode, getattr(self, name).itemsize,
+                         len(getattr(self, name))] for name in self.COLUMNS],
+            'dir_mtimes': self.dir_mtimes, 'token': self.token,
+            'extra': extra or {},
+        }, ensure_ascii=False).encode('utf-8', 'surrogateescape')
+        parts = [self.MAGIC, len(header).to_bytes(4, 'little'), header, bytes(self.names)]
+        parts.extend(getattr(self, name).tobytes() for name in self.COLUMNS)
+        return b"".join(parts)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        """to_bytes()로 만든 바이트에서 (열, extra) 복원 (형식이 다르면 ValueError)"""
+        if not data.startswith(cls.MAGIC):
+            raise ValueError("목록 파일 형식이 아님")
+        offset = len(cls.MAGIC)
+        length = int.from_bytes(data[offset:offset + 4], 'little')
+        offset += 4
+        header = json.loads(data[offset:offset + length].decode('utf-8', 'surrogateescape'))
+        offset += length
+        columns = cls()
+        columns.dirs = header['dirs']
+        columns.dir_ids = {directory: number for number, directory in enumerate(columns.dirs)}
+        columns.suffixes = header['suffixes']
+        columns.suffix_ids = {suffix: number for number, suffix in enumerate(columns.suffixes)}
+        columns.names = bytearray(data[offset:offset + header['names']])
+        offset += header['names']
+        for name, typecode, itemsize, count in header['columns']:
+            column = array(typecode)
+            if column.itemsize != itemsize:
+                raise ValueError("다른 환경에서 저장한 목록")
+            column.frombytes(data[offset:offset + itemsize * count])
+            offset += itemsize * count
+            setattr(columns, name, column)
+        columns.live_count = columns.live.count(1)
+        columns.dir_mtimes = header['dir_mtimes']
+        columns.token = header['token']
+        return columns, header['extra']
+
+
+class ImageCatalog:
+    """CatalogColumns의 항목을 창마다의 순서로 보여 주는 리스트 대용 자료구조
+    
+    표시 순서(order)는 항목 번호 array이므로 섞기/교환은 정수만 옮긴다.
+    경로는 같은 폴더를 보는 창들이 함께 쓰는 columns에 있고, 창은 필터와
+    격리를 거친 순서만 가진다. len, 인덱스 접근, 반복을 리스트와 똑같이
+    지원한다.
+    """
+
+    MAGIC = b"PWORD1\n"
+
+    def __init__(self, paths=(), columns=None, order=None):
+        self.columns = columns if columns is not None else CatalogColumns()
+        self.order = order if order is not None else array('I')  # 표시 순서 -> 항목 번호
+        self.extend(paths)
+    
+    def __len__(self):
+        return len(self.order)
+    
+    def __getitem__(self, position):
+        return self.columns.path_of(self.order[position])
+    
+    def __iter__(self):
+        path_of = self.columns.path_of
+        for entry in self.order:
+            yield path_of(entry)
+    
+    def __contains__(self, image_path):
+        return self.index(image_path) >= 0
+    
+    def append(self, image_path):
+        """맨 뒤에 경로 추가"""
+        self.order.append(self.columns.add(image_path))
+    
+    def extend(self, image_paths):
+        for image_path in image_paths:
+            self.append(image_path)
+    
+    def append_entry(self, entry):
+        """columns에 이미 있는 항목을 맨 뒤에 추가"""
+        self.order.append(entry)
+    
+    def swap(self, first, second):
+        """두 위치의 순서 교환"""
+        order = self.order
+        order[first], order[second] = order[second], order[first]
+    
+    def shuffle(self):
+        """표시 순서를 무작위로 섞기"""
+        order = self.order
+        for i in range(len(order) - 1, 0, -1):
+            j = random.randint(0, i)
+            order[i], order[j] = order[j], order[i]
+    
+    def index(self, image_path):
+        """경로의 표시 위치 (없으면 -1)"""
+        entry = self.columns.find_live([image_path]).get(image_path)
+        if entry is None:
+            return -1
+        try:
+            return self.order.index(entry)
+        except ValueError:
+            return -1
+    
+    def remove_at(self, position):
+        """position의 항목을 O(1)로 제거 (맨 뒤 항목이 그 자리로 옴)"""
+        order = self.order
+        order[position] = order[-1]
+        order.pop()
+    
+    def remove_entries(self, entries):
+        """여러 항목을 한 번에 제거 (나머지 순서는 유지)"""
+        if entries:
+            self.order = array('I', filterfalse(set(entries).__contains__, self.order))
+    
+    def remove_paths(self, image_paths):
+        """여러 경로를 한 번에 제거 (나머지 순서는 유지)"""
+        self.remove_entries(list(self.columns.find_live(image_paths).values()))
+    
+    def drop_dead(self):
+        """columns에서 삭제되었거나 columns에 없는 항목 제거"""
+        live = self.columns.live
+        if self.order and max(self.order) >= len(live):
+            # 저장된 순서가 열보다 나중 것이면 (열 저장 전에 종료 등) 없는 번호부터 뺌
+            self.order = array('I', [entry for entry in self.order if entry < len(live)])
+        self.order = array('I', compress(self.order, map(live.__getitem__, self.order)))
+    
+    def remap(self, mapping):
+        """CatalogColumns.compact()의 옛 번호 -> 새 번호 표로 순서를 옮김"""
+        dead = CatalogColumns.DEAD
+        self.order = array('I', filterfalse(dead.__eq__, map(mapping.__getitem__, self.order)))
+    
+    def to_bytes(self, extra=None):
+        """파일로 저장할 바이트 (JSON 헤더 + 순서 array를 그대로)
+        
+        columns의 token과 항목 수를 함께 저장해, 복원할 때 같은 열인지와
+        저장 뒤에 열에 추가된 항목을 알 수 있게 한다.
+        """
+        header = json.dumps({
+            'token': self.columns.token, 'entries': len(self.columns),
+            'typecode': self.order.typecode, 'itemsize': self.order.itemsize,
+            'extra': extra or {},
+        }, ensure_ascii=False).encode('utf-8', 'surrogateescape')
+        return b"".join([self.MAGIC, len(header).to_bytes(4, 'little'), header,
+                         self.order.tobytes()])
+    
+    @classmethod
+    def order_from_bytes(cls, data):
+        """to_bytes()로 만든 바이트에서 (순서 array, 헤더) 복원 (형식이 다르면 ValueError)"""
+        if not data.startswith(cls.MAGIC):
+            raise ValueError("목록 파일 형식이 아님")
+        offset = len(cls.MAGIC)
+        length = int.from_bytes(data[offset:offset + 4], 'little')
+        offset += 4
+        header = json.loads(data[offset:offset + length].decode('utf-8', 'surrogateescape'))
+        order = array(header['typecode'])
+        if order.itemsize != header['itemsize']:
+            raise ValueError("다른 환경에서 저장한 목록")
+        order.frombytes(data[offset + length:])
+        return order, header
+
+
+class LazyShuffle:
+    """시드와 위치만으로 k번째 섞인 인덱스를 계산하는 O(1) 메모리 순열
+    
+    [0, 4**half_bits) 범위에서 4라운드 Feistel 순열을 만들고, 목록 크기 이상인
+    값이 나오는 자리는 건너뛴다. 범위는 목록 크기의 4배를 넘지 않으므로 한 번
+    전진할 때 평균 4번 이하로 계산한다. 목록이 범위 안에서 커지면 순열은
+    그대로이고, 범위를 넘으면 이번 바퀴는 원래 순열로 끝까지 돈 뒤 다음 바퀴부터
+    범위를 넓힌다 (바퀴 도중에 순열을 바꾸면 이미 나온 사진이 다시 나오고 일부는
+    빠짐). 한 바퀴를 다 돌면 새 시드로 다음 바퀴를 시작한다.
+    """
+
+    ROUNDS = 4
+    MASK64 = (1 << 64) - 1
+
+    def __init__(self, seed=None, position=0, half_bits=1):
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.position = position
+        self.half_bits = max(1, half_bits)
+        self._make_keys()
+    
+    def _make_keys(self):
+        rng = random.Random(self.seed)
+        self.keys = [rng.getrandbits(64) for _ in range(self.ROUNDS)]
+    
+    @property
+    def domain(self):
+        return 1 << (2 * self.half_bits)
+    
+    @classmethod
+    def _mix(cls, value):
+        """splitmix64 섞기 함수"""
+        value = (value + 0x9E3779B97F4A7C15) & cls.MASK64
+        value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & cls.MASK64
+        value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & cls.MASK64
+        return value ^ (value >> 31)
+    
+    def permute(self, value):
+        """[0, domain) 안의 값을 섞인 위치로 변환 (일대일)"""
+        mask = (1 << self.half_bits) - 1
+        left, right = value >> self.half_bits, value & mask
+        for key in self.keys:
+            left, right = right, left ^ (self._mix(right ^ key) & mask)
+        return (left << self.half_bits) | right
+    
+    def ensure_size(self, count):
+        """목록 크기가 범위를 넘으면 범위 확장 (바퀴를 시작할 때만 - 범위 밖 항목은 다음 바퀴에)"""
+        if self.position:
+            return
+        while self.domain < count:
+            self.half_bits += 1
+    
+    def advance(self, count):
+        """다음 섞인 인덱스 (0 <= 결과 < count)"""
+        self.ensure_size(count)
+        while True:
+            if self.position >= self.domain:
+                # 한 바퀴 끝: 새 순서로 다시 시작
+                self.seed = random.getrandbits(32)
+                self.position = 0
+                self._make_keys()
+                self.ensure_size(count)
+            value = self.permute(self.position)
+            self.position += 1
+            if value < count:
+                return value
+    
+    def peek(self, depth, count):
+        """위치를 바꾸지 않고 다음 depth개 인덱스 미리 보기 (이번 바퀴 안에서만)"""
+        self.ensure_size(count)
+        upcoming = []
+        position = self.position
+        while len(upcoming) < depth and position < self.domain:
+            value = self.permute(position)
+            position += 1
+            if value < count:
+                upcoming.append(value)
+        return upcoming
+    
+    def state(self):
+        """설정 파일에 저장할 상태"""
+        return {'shuffle_seed': self.seed, 'shuffle_position': self.position,
+                'shuffle_half_bits': self.half_bits}
+
+
+class FolderIndex:
+    """폴더 트리의 디렉터리 수정 시각과 이미지 목록을 저장해 바뀐 디렉터리만 다시 읽는 인덱스"""
+
+    def __init__(self, index_file, extensions, load=True, files=LOCAL_FILES):
+        self.index_file = index_file
+        self.extensions = extensions
+        self.files = files  # 디렉터리 접근 (공유 폴더면 SlowStorage)
+        self.root = None
+        # 루트 기준 상대 경로 -> {'mtime': 수정 시각(ns), 'subdirs': [...], 'files': "a.jpg/b.png"}
+        # 파일 이름에는 '/'가 들어갈 수 없으므로 디렉터리마다 문자열 하나로 보관
+        self.dirs = {}
+        # 루트 기준 상대 경로 -> {파일 이름: [너비, 높이, EXIF 방향, 촬영일]} (헤더에서 읽은 정보)
+        # 스캔 중에도 채울 수 있도록 디렉터리 목록과 따로 보관
+        self.meta = {}
+        self.lock = threading.Lock()
+        self.meta_lock = threading.Lock()
+        # 스캔 한 번(목록 만들기 + 갱신 + 변경분 전달)을 통째로 묶음: 같은 폴더를 여러
+        # 창/감시가 함께 쓸 때 한쪽이 찾은 변경을 다른 쪽이 놓치지 않고, 변경분이 찾은
+        # 순서대로 전달되도록 한 번에 하나씩 (refresh()가 안에서 다시 잡으므로 RLock)
+        self.scan_lock = threading.RLock()
+        self.last_stats = {}
+        self.loaded = False
+        if load:
+            self.load()
+    
+    def load(self):
+        """저장된 인덱스 로드"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.root = data['root']
+                self.dirs = data['dirs']
+                self.meta = data.get('meta', {})
+                for entry in self.dirs.values():
+                    if isinstance(entry['files'], list):
+                        entry['files'] = '/'.join(entry['files'])
+        except Exception as e:
+            print(f"폴더 인덱스 로드 실패: {e}")
+            self.root = None
+            self.dirs = {}
+            self.meta = {}
+        self.loaded = True
+    
+    def ensure_loaded(self):
+        """만들 때 읽지 않았으면 지금 로드 (시작을 늦추지 않도록 백그라운드에서 호출)"""
+        with self.lock:
+            if not self.loaded:
+                self.load()
+    
+    def save(self):
+        """인덱스 저장"""
+        with self.lock, self.meta_lock:
+            if not self.loaded:
+                # 읽기 전에 저장하면 기존 인덱스를 빈 내용으로 덮어씀
+                return
+            data = {'root': self.root, 'dirs': self.dirs, 'meta': self.meta}
+            try:
+                temp_file = self.index_file + ".tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_file, self.index_file)
+            except Exception as e:
+                print(f"폴더 인덱스 저장 실패: {e}")
+    
+    def refresh(self, folder_path):
+        """folder_path를 다시 스캔하고 (추가된 파일, 삭제된 파일) 경로 목록 반환"""
+        added = []
+        removed = []
+        with self.scan_lock:
+            for batch_added, batch_removed in self.iter_refresh(folder_path):
+                added.extend(batch_added)
+                removed.extend(batch_removed)
+        return added, removed
+    
+    def iter_refresh(self, folder_path):
+        """folder_path를 스캔하면서 디렉터리마다 (추가된 파일, 삭제된 파일)을 바로 내보내는 제너레이터
+        
+        수정 시각이 그대로인 디렉터리는 목록을 다시 읽지 않고 저장된 내용을 사용.
+        공유 폴더가 응답하지 않으면 StorageUnavailable로 중단하고 인덱스는 그대로 둔다
+        (읽지 못한 디렉터리를 삭제된 것으로 처리하지 않도록).
+        """
+        with self.lock:
+            start = time.perf_counter()
+            folder_path = os.path.abspath(folder_path)
+            if folder_path != self.root:
+                self.root = folder_path
+                self.dirs = {}
+                with self.meta_lock:
+                    self.meta = {}
+            
+            old_dirs = self.dirs
+            new_dirs = {}
+            stats = {'dirs_visited': 0, 'dirs_scanned': 0, 'entries_read': 0,
+                     'added': 0, 'removed': 0}
+            
+            pending = ['']
+            while pending:
+                rel_dir = pending.pop()
+                abs_dir = os.path.join(folder_path, rel_dir)
+                try:
+                    mtime = self.files.stat(abs_dir).st_mtime_ns
+                except OSError:
+                    continue
+                stats['dirs_visited'] += 1
+                
+                old_entry = old_dirs.get(rel_dir)
+                entry = old_entry
+                if entry is None or entry['mtime'] != mtime:
+                    entry = self._scan_dir(abs_dir, mtime, stats)
+                    if entry is None:
+                        continue
+                new_dirs[rel_dir] = entry
+                pending.extend(os.path.join(rel_dir, name) for name in entry['subdirs'])
+                
+                # 바뀐 디렉터리만 비교해서 변경분 계산
+                if entry is not old_entry:
+                    old_files = self.file_names(old_entry) if old_entry else []
+                    new_files = self.file_names(entry)
+                    old_set = set(old_files)
+                    new_set = set(new_files)
+                    added = [os.path.join(abs_dir, name)
+                             for name in new_files if name not in old_set]
+                    removed = [os.path.join(abs_dir, name)
+                               for name in old_files if name not in new_set]
+                    self._drop_metadata(rel_dir, old_set - new_set)
+                    if added or removed:
+                        stats['added'] += len(added)
+                        stats['removed'] += len(removed)
+                        yield added, removed
+            
+            # 사라진 디렉터리의 파일은 모두 삭제 처리
+            removed = [os.path.join(folder_path, rel_dir, name)
+                       for rel_dir, old_entry in old_dirs.items() if rel_dir not in new_dirs
+                       for name in self.file_names(old_entry)]
+            with self.meta_lock:
+                for rel_dir in [rel_dir for rel_dir in self.meta if rel_dir not in new_dirs]:
+                    del self.meta[rel_dir]
+            if removed:
+                stats['removed'] += len(removed)
+                yield [], removed
+            
+            self.dirs = new_dirs
+            stats['files_total'] = sum(len(self.file_names(entry)) for entry in new_dirs.values())
+            stats['seconds'] = round(time.perf_counter() - start, 3)
+            self.last_stats = stats
+    
+    def _scan_dir(self, abs_dir, mtime, stats):
+        """디렉터리 하나의 이미지 파일과 하위 디렉터리 목록 읽기"""
+        files = []
+        subdirs = []
+        try:
+            for name, is_dir in self.files.list_dir(abs_dir):
+                stats['entries_read'] += 1
+                if is_dir:
+                    subdirs.append(name)
+                elif os.path.splitext(name.lower())[1] in self.extensions:
+                    files.append(name)
+        except OSError as e:
+            print(f"폴더 읽기 실패: {abs_dir}, 오류: {e}")
+            return None
+        stats['dirs_scanned'] += 1
+        return {'mtime': mtime, 'subdirs': subdirs, 'files': '/'.join(files)}
+    
+    @staticmethod
+    def file_names(entry):
+        """디렉터리 항목의 파일 이름 목록"""
+        return entry['files'].split('/') if entry['files'] else []
+    
+    def build_columns(self):
+        """인덱스에 있는 모든 이미지 파일로 CatalogColumns 생성"""
+        columns = CatalogColumns()
+        with self.lock:
+            for rel_dir, entry in self.dirs.items():
+                if entry['files']:
+                    # 경로를 나눌 때와 같은 디렉터리 이름이 되도록 루트는 끝에 구분자 없이
+                    directory = os.path.join(self.root, rel_dir) if rel_dir else self.root
+                    columns.add_directory(directory, self.file_names(entry))
+            columns.dir_mtimes = {rel_dir: entry['mtime'] for rel_dir, entry in self.dirs.items()}
+        return columns
+    
+    def build_catalog(self):
+        """인덱스에 있는 모든 이미지 파일로 ImageCatalog 생성 (인덱스 순서)"""
+        columns = self.build_columns()
+        return ImageCatalog(columns=columns, order=array('I', range(len(columns))))
+    
+    def dir_mtimes(self):
+        """디렉터리별 수정 시각 {루트 기준 경로: 수정 시각(ns)} (목록과 함께 저장해 다음 비교에 사용)"""
+        with self.lock:
+            return {rel_dir: entry['mtime'] for rel_dir, entry in self.dirs.items()}
+    
+    def catalog_changes(self, columns):
+        """columns.dir_mtimes 때의 인덱스로 만든 columns와 지금 인덱스의 차이 (추가 경로, 삭제 경로)
+        
+        수정 시각이 그대로인 디렉터리는 비교하지 않고, 나머지 디렉터리만
+        열의 디렉터리 테이블과 이름 열에서 파일 이름을 꺼내 비교한다.
+        """
+        dir_mtimes = columns.dir_mtimes
+        with self.lock:
+            unchanged = set()
+            current = {}  # 바뀐 디렉터리 -> 지금 인덱스의 파일 이름
+            for rel_dir, entry in self.dirs.items():
+                directory = os.path.normpath(os.path.join(self.root, rel_dir))
+                if dir_mtimes.get(rel_dir) == entry['mtime']:
+                    unchanged.add(directory)
+                    continue
+                current[directory] = set(self.file_names(entry))
+        # 열에만 있는 디렉터리(삭제되었거나 수정 시각 기록이 없는 것)도 비교 대상
+        targets = set(current)
+        targets.update(os.path.normpath(directory) for directory in columns.dirs)
+        targets -= unchanged
+        known = columns.directory_names(targets)
+        added = []
+        removed = []
+        for directory in targets:
+            names = current.get(directory, set())
+            old_names = known[directory]
+            added.extend(os.path.join(directory, name) for name in names - old_names)
+            removed.extend(os.path.join(directory, name) for name in old_names - names)
+        return added, removed
+    
+    def matching_entries(self, columns, entries, keep):
+        """columns의 항목 entries 중 헤더 정보가 있고 keep이 True인 것만 array로
+        
+        경로마다 상대 경로를 계산하지 않도록 디렉터리별 헤더 정보를 먼저 찾아 둔다.
+        """
+        matched = array('I')
+        if self.root is None:
+            return matched
+        root = os.path.normpath(self.root)
+        dir_meta = []
+        for directory in list(columns.dirs):
+            directory = os.path.normpath(directory)
+            rel_dir = '' if directory == root else os.path.relpath(directory, self.root)
+            dir_meta.append(self.meta.get(rel_dir))
+        for entry in entries:
+            meta = dir_meta[columns.entry_dir[entry]]
+            if meta:
+                metadata = meta.get(columns.file_name(entry))
+                if metadata is not None and keep(metadata):
+                    matched.append(entry)
+        return matched
+    
+    def _split(self, image_path):
+        """절대 경로 -> (루트 기준 디렉터리, 파일 이름)"""
+        return os.path.split(os.path.relpath(image_path, self.root))
+    
+    def _drop_metadata(self, rel_dir, names):
+        if not names:
+            return
+        with self.meta_lock:
+            meta = self.meta.get(rel_dir)
+            if meta:
+                for name in names:
+                    meta.pop(name, None)
+    
+    def get_metadata(self, image_path):
+        """저장된 헤더 정보 [너비, 높이, 방향, 촬영일] (아직 읽지 않았으면 None)"""
+        if self.root is None:
+            return None
+        rel_dir, name = self._split(image_path)
+        meta = self.meta.get(rel_dir)
+        return meta.get(name) if meta else None
+    
+    def set_metadata(self, image_path, metadata):
+        """헤더 정보 저장 (다른 곳에서 이미 파일을 열었을 때)"""
+        rel_dir, name = self._split(image_path)
+        with self.meta_lock:
+            self.meta.setdefault(rel_dir, {})[name] = metadata
+    
+    def fill_metadata(self, image_paths=None, should_stop=None):
+        """헤더 정보가 없는 파일의 헤더만 읽어 저장하고 새로 읽은 경로 목록 반환
+        
+        image_paths가 None이면 인덱스의 모든 파일. 스캔 중에도 호출할 수 있다.
+        should_stop()이 True가 되면 거기까지만 처리.
+        """
+        if image_paths is None:
+            with self.lock:
+                if self.root is None:
+                    return []
+                image_paths = [os.path.join(self.root, rel_dir, name)
+                               for rel_dir, entry in self.dirs.items()
+                               for name in self.file_names(entry)
+                               if name not in self.meta.get(rel_dir, ())]
+        
+        filled = []
+        for image_path in image_paths:
+            if should_stop is not None and should_stop():
+                break
+            if self.get_metadata(image_path) is not None:
+                continue
+            try:
+                metadata = read_image_metadata(image_path, self.files)
+            except StorageUnavailable:
+                # 연결이 돌아온 뒤 다음 스캔에서 이어서
+                break
+            except Exception:
+                # 읽을 수 없는 파일은 표시할 때 격리되므로 여기서는 건너뜀
+                continue
+            self.set_metadata(image_path, metadata)
+            filled.append(image_path)
+        return filled
+    
+    def get_stats(self):
+        """마지막 스캔 통계 (방문/실제로 읽은 디렉터리 수, 읽은 항목 수 등)"""
+        return dict(self.last_stats)
+
+
+class InotifyWatch:
+    """리눅스 inotify로 디렉터리 변경 알림 받기 (사용할 수 없으면 생성시 OSError)"""
+
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    # IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+    MASK = 0x100 | 0x200 | 0x40 | 0x80 | 0x400 | 0x800
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify를 지원하지 않는 플랫폼")
+        import ctypes
+        import ctypes.util
+        self.ctypes = ctypes
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 실패")
+        self.watches = {}  # 디렉터리 경로 -> watch descriptor
+    
+    def sync(self, directories):
+        """directories 목록과 감시 대상을 일치시킴"""
+        directories = set(directories)
+        for path in list(self.watches):
+            if path not in directories:
+                self.libc.inotify_rm_watch(self.fd, self.watches.pop(path))
+        for path in directories:
+            if path not in self.watches:
+                wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+                if wd < 0:
+                    err = self.ctypes.get_errno()
+                    if err == errno.ENOSPC:
+                        raise OSError(err, "inotify 감시 개수 한도 초과")
+                    continue
+                self.watches[path] = wd
+    
+    def wait(self, timeout):
+        """timeout초 동안 이벤트를 기다려 하나라도 있으면 True (쌓인 이벤트는 비움)"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """사진 폴더를 감시해 추가/삭제/이름 변경을 모아서 전달
+    
+    inotify를 쓸 수 있으면 알림을 받고, 아니면 poll_interval마다 디렉터리
+    수정 시각만 확인한다. 짧은 시간에 몰린 변경(카메라 가져오기 등)은
+    조용해질 때까지 기다렸다가 한 번에 on_changes(추가 목록, 삭제 목록)로 전달.
+    """
+
+    def __init__(self, folder_index, on_changes, poll_interval=30,
+                 settle_delay=1.0, max_delay=10.0):
+        self.folder_index = folder_index
+        # 공유 폴더는 다른 컴퓨터의 변경이 inotify로 오지 않으므로 폴링만
+        self.use_inotify = True
+        self.on_changes = on_changes
+        self.poll_interval = poll_interval
+        self.settle_delay = settle_delay
+        self.max_delay = max_delay
+        self.folder_path = None
+        self.thread = None
+        self.stop_event = threading.Event()
+    
+    def start(self, folder_path):
+        """folder_path 감시 시작 (이미 감시 중이면 대상 변경)"""
+        self.stop()
+        self.folder_path = folder_path
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(self.stop_event,),
+                                       name="folder-watcher", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """감시 중지"""
+        self.stop_event.set()
+        self.thread = None
+    
+    def _watched_dirs(self):
+        index = self.folder_index
+        with index.lock:
+            return [os.path.join(index.root, rel_dir) for rel_dir in index.dirs]
+    
+    def _run(self, stop_event):
+        inotify = None
+        try:
+            if self.use_inotify:
+                inotify = InotifyWatch()
+                inotify.sync(self._watched_dirs())
+        except OSError as e:
+            print(f"inotify 사용 불가, 폴링으로 감시합니다: {e}")
+            if inotify:
+                inotify.close()
+                inotify = None
+        
+        try:
+            while not stop_event.is_set():
+                if inotify:
+                    # 알림이 없어도 poll_interval마다 한 번은 직접 확인 (알림 누락 대비)
+                    if inotify.wait(self.poll_interval):
+                        # 이벤트가 잠잠해질 때까지 모았다가 한 번에 처리
+                        deadline = time.monotonic() + self.max_delay
+                        while inotify.wait(self.settle_delay) and time.monotonic() < deadline:
+                            pass
+                elif stop_event.wait(self.poll_interval):
+                    break
+                
+                if stop_event.is_set():
+                    break
+                # 전달까지 스캔 잠금 안에서 (같은 폴더의 스캔이 찾은 변경분과 순서가 섞이지 않게)
+                with self.folder_index.scan_lock:
+                    try:
+                        added, removed = self.folder_index.refresh(self.folder_path)
+                    except StorageUnavailable as e:
+                        # 연결이 돌아오면 다음 확인 때 한꺼번에 반영
+                        print(f"폴더 확인 건너뜀: {e}")
+                        continue
+                    if added or removed:
+                        self.folder_index.save()
+                        self.on_changes(added, removed)
+                
+                if inotify:
+                    try:
+                        inotify.sync(self._watched_dirs())
+                    except OSError as e:
+                        print(f"inotify 감시 추가 실패, 폴링으로 전환합니다: {e}")
+                        inotify.close()
+                        inotify = None
+        except Exception as e:
+            print(f"폴더 감시 오류: {e}")
+        finally:
+            if inotify:
+                inotify.close()
+
+
+class QuarantineStore:
+    """디코딩에 실패한 파일 기록 (경로, 크기, 수정 시각 기준)
+    
+    파일이 그대로이면 다시 시도하지 않고 건너뛴다. 파일이 바뀌면 다시 시도하되,
+    계속 실패하면 실패 횟수에 따라 재시도 간격을 늘린다(복사 중인 파일 등).
+    """
+
+    RETRY_BASE_SECONDS = 60
+    RETRY_MAX_SECONDS = 24 * 60 * 60
+
+    def __init__(self, store_file):
+        self.store_file = store_file
+        # 경로 -> {'size', 'mtime', 'failures', 'retry_after', 'error'}
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.unsaved = 0
+        self.load()
+    
+    def load(self):
+        """저장된 기록 로드"""
+        try:
+            if os.path.exists(self.store_file):
+                with open(self.store_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+        except Exception as e:
+            print(f"실패 기록 로드 실패: {e}")
+            self.entries = {}
+    
+    def save(self):
+        """기록 저장"""
+        with self.lock:
+            data = dict(self.entries)
+            self.unsaved = 0
+        try:
+            temp_file = self.store_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.store_file)
+        except Exception as e:
+            print(f"실패 기록 저장 실패: {e}")
+    
+    def is_quarantined(self, image_path, files=LOCAL_FILES):
+        """건너뛰어야 하는 파일이면 True
+        
+        파일 정보는 files로 확인한다 (공유 폴더가 끊겨 확인할 수 없으면 계속 건너뜀).
+        """
+        entry = self.entries.get(image_path)
+        if entry is None:
+            return False
+        try:
+            stat = files.stat(image_path)
+        except (OSError, StorageUnavailable):
+            return True
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime']:
+            return True
+        # 파일이 바뀌었으면 대기 시간이 지난 뒤 다시 시도
+        return time.time() < entry['retry_after']
+    
+    def blocked(self, image_paths, files=LOCAL_FILES):
+        """image_paths 중 건너뛰어야 하는 파일 목록"""
+        return [path for path in image_paths
+                if path in self.entries and self.is_quarantined(path, files)]
+    
+    def blocked_under(self, folder_path, files=LOCAL_FILES):
+        """folder_path 아래에서 건너뛰어야 하는 파일 목록"""
+        prefix = os.path.join(folder_path, '')
+        return self.blocked([path for path in list(self.entries) if path.startswith(prefix)],
+                            files)
+    
+    def record_failure(self, image_path, error, files=LOCAL_FILES):
+        """실패 기록 (같은 파일이 다시 실패하면 재시도 간격을 두 배로)"""
+        try:
+            stat = files.stat(image_path)
+        except (OSError, StorageUnavailable):
+            return
+        with self.lock:
+            entry = self.entries.get(image_path)
+            failures = entry['failures'] + 1 if entry else 1
+            delay = min(self.RETRY_BASE_SECONDS * 2 ** (failures - 1), self.RETRY_MAX_SECONDS)
+            self.entries[image_path] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'failures': failures,
+                'retry_after': time.time() + delay,
+                'error': str(error)[:200],
+            }
+            self.unsaved += 1
+            save_now = self.unsaved >= 20
+        if save_now:
+            self.save()
+    
+    def record_success(self, image_path):
+        """다시 읽히게 된 파일은 기록에서 삭제"""
+        if image_path in self.entries:
+            with self.lock:
+                self.entries.pop(image_path, None)
+                self.unsaved += 1
+
+
+class ImagePrefetcher:
+    """다음에 표시할 이미지들을 작업 스레드에서 미리 디코딩/리사이즈"""
+
+    def __init__(self, loader, depth=3, workers=2, executor=None):
+        self.loader = loader
+        self.depth = depth
+        # 여러 창이 함께 쓰는 작업 스레드를 받으면 종료는 넘겨준 쪽에서
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=workers,
+                                                       thread_name_prefix="prefetch")
+        self.pending = {}  # (경로, 크기) -> Future
+        self.lock = threading.Lock()
+
+    def schedule(self, image_paths, box):
+        """image_paths 앞쪽 depth개를 box 크기로 미리 준비"""
+        wanted = [(path, box) for path in image_paths[:self.depth]]
+        with self.lock:
+            # 더 이상 필요 없는 작업은 취소 (이미 실행 중이면 결과만 버림)
+            for key in list(self.pending):
+                if key not in wanted:
+                    self.pending.pop(key).cancel()
+            for key in wanted:
+                if key not in self.pending:
+                    self.pending[key] = self.executor.submit(self.loader, *key)
+
+    def take(self, image_path, box):
+        """준비된(또는 준비 중인) 이미지를 꺼냄. 없으면 None"""
+        with self.lock:
+            future = self.pending.pop((image_path, box), None)
+        if future is None or future.cancel():
+            # 예약만 되어 있던 작업은 취소하고 호출한 쪽에서 직접 디코딩
+            return None
+        # 이미 디코딩 중이면 처음부터 다시 하는 것보다 기다리는 편이 빠름
+        return future.result()
+
+    def clear(self):
+        """예약된 작업 모두 취소"""
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+
+    def shutdown(self):
+        """작업 스레드 종료"""
+        self.clear()
+        if self.owns_executor:
+            self.executor.shutdown(wait=False)
+
+
+class SlideshowScheduler:
+    """Tk 이벤트 루프의 after 타이머 하나로 동작하는 슬라이드쇼 스케줄러
+    
+    sleep 대신 다음 전환 시각(deadline)을 기준으로 예약하므로 디코딩에 걸린
+    시간만큼 간격이 밀리지 않는다. can_run()이 False이면(숨김, 빈 폴더)
+    타이머를 아예 걸지 않으며, 상태가 바뀌면 update()로 다시 확인한다.
+    """
+
+    def __init__(self, root, on_tick, interval, can_run):
+        self.root = root
+        self.on_tick = on_tick
+        self.interval = interval
+        self.can_run = can_run
+        self.job = None
+        self.deadline = None
+        self.last_tick = None
+        self.paused = False
+    
+    def start(self):
+        """지금부터 interval 뒤에 첫 전환"""
+        self.last_tick = time.monotonic()
+        self.deadline = self.last_tick + self.interval
+        self._arm()
+    
+    def stop(self):
+        """슬라이드쇼 중지"""
+        self._cancel()
+        self.deadline = None
+    
+    def pause(self):
+        """일시정지 (타이머 해제)"""
+        self.paused = True
+        self._cancel()
+    
+    def resume(self):
+        """일시정지 해제, interval 뒤에 다음 전환"""
+        self.paused = False
+        if self.deadline is not None:
+            self.start()
+    
+    def toggle_pause(self):
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+    
+    def set_interval(self, interval):
+        """전환 간격 변경 (마지막 전환 시각 기준으로 바로 적용)"""
+        self.interval = interval
+        if self.deadline is not None:
+            self.deadline = self.last_tick + interval
+            self._arm()
+    
+    def update(self):
+        """실행 조건(숨김, 이미지 유무)이 바뀌었을 때 타이머 다시 확인"""
+        if self.deadline is not None and self.deadline < time.monotonic():
+            # 멈춰 있던 동안 놓친 전환을 한꺼번에 하지 않음
+            self.start()
+        else:
+            self._arm()
+    
+    def _arm(self):
+        self._cancel()
+        if self.paused or self.deadline is None or not self.can_run():
+            return
+        delay = max(0, int((self.deadline - time.monotonic()) * 1000))
+        self.job = self.root.after(delay, self._fire)
+    
+    def _cancel(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+    
+    def _fire(self):
+        self.job = None
+        self.last_tick = self.deadline
+        try:
+            self.on_tick()
+        finally:
+            # on_tick에서 예외가 나도 슬라이드쇼는 계속 (on_tick이 stop()했으면 그대로 멈춤)
+            if self.deadline is not None:
+                self.deadline += self.interval
+                now = time.monotonic()
+                if self.deadline < now:
+                    # 전환이 interval보다 오래 걸렸으면 지금부터 다시 계산
+                    self.last_tick = now
+                    self.deadline = now + self.interval
+                self._arm()
+
+
+
+class AnimationPlayer:
+    """움직이는 GIF/WebP/PNG를 Tk after 타이머로 재생
+    
+    프레임은 재생하는 동안 작업 스레드가 한 장씩 디코딩/축소해 재생 위치
+    앞쪽을 채운다. 축소한 프레임은 budget_bytes 안에서만 보관하고, 넘치면
+    다음 재생 순서가 가장 먼 프레임부터 버린다. 전체가 예산에 들어가면 두
+    번째 바퀴부터는 디코딩하지 않고, 넘으면 매 바퀴 파일에서 다시 읽는다.
+    can_run()이 False이면(숨김) 타이머와 디코딩을 모두 멈춘다.
+    """
+
+    ANIMATED_SUFFIXES = {'.gif', '.webp', '.png'}
+    DEFAULT_DELAY_MS = 100  # 지연이 0~10ms인 프레임은 브라우저처럼 100ms로
+    MIN_DELAY_MS = 20
+    LATE_RETRY_MS = 10
+
+    def __init__(self, root, on_frame, can_run, budget_bytes=32 * 1024 * 1024,
+                 metrics=NO_METRICS):
+        self.root = root
+        self.on_frame = on_frame
+        self.can_run = can_run
+        self.budget_bytes = budget_bytes
+        self.metrics = metrics
+        self.cond = threading.Condition()
+        self.generation = 0
+        self.job = None
+        self.playing = False
+        self.paused = False
+        self.failed = False
+        self.image_path = None
+        self.frames = {}  # 프레임 번호 -> (축소한 이미지, 표시 시간 ms)
+        self.frame_bytes = 0
+        self.frame_count = 0
+        self.position = 0  # 다음에 표시할 프레임
+        self.deadline = None
+        self.decoded_count = 0
+        self.peak_bytes = 0
+    
+    def start(self, image_path, box, files=LOCAL_FILES):
+        """image_path가 여러 프레임이면 box 크기로 재생 시작 (첫 프레임이 준비되면 타이머 시작)
+        
+        파일은 files로 연다 (공유 폴더면 SlowStorage - 제한 시간과 읽어 둔 내용을 그대로 씀).
+        """
+        self.stop()
+        if os.path.splitext(image_path)[1].lower() not in self.ANIMATED_SUFFIXES:
+            return
+        with self.cond:
+            self.image_path = image_path
+            self.failed = False
+            self.decoded_count = 0
+            self.peak_bytes = 0
+            generation = self.generation
+        threading.Thread(target=self._decode_frames, args=(generation, image_path, box, files),
+                         name="animation", daemon=True).start()
+    
+    def stop(self):
+        """재생 중지 (작업 스레드도 종료하고 프레임 해제)"""
+        self._cancel()
+        with self.cond:
+            self.generation += 1
+            self.playing = False
+            self.image_path = None
+            self.frames = {}
+            self.frame_bytes = 0
+            self.frame_count = 0
+            self.position = 0
+            self.deadline = None
+            self.cond.notify_all()
+    
+    def update(self):
+        """실행 조건(숨김, 크기 조절 중)이 바뀌었을 때 재생/멈춤 다시 확인"""
+        if not self.playing:
+            return
+        if self.can_run():
+            if self.paused:
+                with self.cond:
+                    self.paused = False
+                    # 멈춰 있던 동안 놓친 프레임을 한꺼번에 넘기지 않음
+                    self.deadline = None
+                    self.cond.notify_all()
+                self._arm(0)
+        else:
+            self._cancel()
+            with self.cond:
+                self.paused = True
+    
+    def _begin(self, generation):
+        # 첫 프레임이 준비되면 작업 스레드가 메인 스레드로 요청
+        if generation != self.generation or self.playing:
+            return
+        self.playing = True
+        self.paused = not self.can_run()
+        if not self.paused:
+            self._arm(0)
+    
+    def _arm(self, delay):
+        self._cancel()
+        self.job = self.root.after(delay, self._tick)
+    
+    def _cancel(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+    
+    def _tick(self):
+        self.job = None
+        if not self.can_run():
+            self.update()
+            return
+        with self.cond:
+            entry = self.frames.get(self.position)
+            if entry is not None:
+                self.position = (self.position + 1) % self.frame_count
+                # 재생 위치가 바뀌면 버릴 프레임과 다음에 읽을 프레임도 바뀜
+                self.cond.notify_all()
+            failed = self.failed
+        if entry is None:
+            if failed:
+                self.playing = False
+                return
+            # 디코딩이 재생을 못 따라가면 잠시 뒤 다시 확인
+            self.metrics.count('animation_late')
+            self._arm(self.LATE_RETRY_MS)
+            return
+        
+        image, delay = entry
+        with self.metrics.stage('animation_frame'):
+            self.on_frame(image)
+        now = time.monotonic()
+        if self.deadline is None or self.deadline + delay / 1000 < now:
+            # 처음이거나 밀렸으면 지금부터 다시 계산
+            self.deadline = now
+        self.deadline += delay / 1000
+        self._arm(max(0, int((self.deadline - now) * 1000)))
+    
+    def _decode_frames(self, generation, image_path, box, files):
+        """(작업 스레드) 재생 위치 앞쪽의 없는 프레임을 차례로 디코딩/축소"""
+        try:
+            with files.open(image_path) as f, Image.open(f) as image:
+                if not getattr(image, 'is_animated', False):
+                    return
+                count = image.n_frames
+                orientation = exif_orientation(image)
+                if orientation in (5, 6, 7, 8):
+                    box = (box[1], box[0])
+                with self.cond:
+                    if generation != self.generation:
+                        return
+                    self.frame_count = count
+                estimate = 0
+                while True:
+                    with self.cond:
+                        index = self._next_missing(generation, estimate)
+                        if index is None:
+                            return
+                    with self.metrics.stage('animation_decode'):
+                        frame, delay = self._read_frame(image, index, box, orientation)
+                    size = len(frame.getbands()) * frame.width * frame.height
+                    estimate = max(estimate, size)
+                    with self.cond:
+                        if generation != self.generation:
+                            return
+                        self.frames[index] = (frame, delay)
+                        self.frame_bytes += size
+                        self.peak_bytes = max(self.peak_bytes, self.frame_bytes)
+                        self.decoded_count += 1
+                        first = len(self.frames) == 1 and not self.playing
+                    if first:
+                        self.root.after(0, lambda: self._begin(generation))
+        except Exception as e:
+            print(f"애니메이션 재생 실패: {image_path}, 오류: {e}")
+            with self.cond:
+                if generation == self.generation:
+                    self.failed = True
+    
+    def _next_missing(self, generation, estimate):
+        """(cond를 잡은 상태) 다음에 디코딩할 프레임 번호, 멈춰야 하면 None
+        
+        재생 위치부터 가장 가까운 없는 프레임을 고르고, 예산이 부족하면 그보다
+        멀리 있는 프레임을 버려 자리를 만든다. 버릴 것이 없으면(앞쪽이 다 찼거나
+        전체가 들어 있으면) 재생 위치가 바뀔 때까지 기다린다.
+        """
+        while generation == self.generation:
+            if not self.paused:
+                count = self.frame_count
+                distance = next((distance for distance in range(count)
+                                 if (self.position + distance) % count not in self.frames), None)
+                while distance is not None:
+                    if not self.frames or self.frame_bytes + estimate <= self.budget_bytes:
+                        return (self.position + distance) % count
+                    farthest = max(self.frames, key=lambda index: (index - self.position) % count)
+                    if (farthest - self.position) % count <= distance:
+                        break
+                    frame, _ = self.frames.pop(farthest)
+                    self.frame_bytes -= len(frame.getbands()) * frame.width * frame.height
+            self.cond.wait()
+        return None
+    
+    def _read_frame(self, image, index, box, orientation):
+        """index번 프레임을 box 크기로 축소한 (이미지, 표시 시간 ms)"""
+        image.seek(index)
+        delay = image.info.get('duration') or 0
+        if delay <= 10:
+            delay = self.DEFAULT_DELAY_MS
+        delay = max(int(delay), self.MIN_DELAY_MS)
+        if image.mode in ('RGB', 'RGBA'):
+            frame = image.copy()
+        else:
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            frame = image.convert('RGBA' if has_alpha else 'RGB')
+        frame.thumbnail(box, Image.Resampling.LANCZOS)
+        if orientation != 1:
+            frame = frame.transpose(EXIF_TRANSPOSE[orientation])
+        return frame, delay
+
+
+class TransitionPlayer:
+    """이미지 전환 효과 (크로스페이드, 슬라이드)
+    
+    전환 프레임은 작업 스레드가 Pillow 일괄 연산(Image.blend, paste)으로 몇 장
+    앞서 만들고, Tk 스레드는 준비된 프레임을 표시만 한다. 프레임은 경과 시간
+    기준으로 고르므로 늦으면 중간 프레임을 건너뛰고, 표시 한 번이 프레임
+    예산(1/fps)을 넘으면 프레임 간격을 늘린다.
+    """
+
+    EFFECTS = ('none', 'crossfade', 'slide')
+    AHEAD = 3  # 표시한 프레임보다 앞서 만들어 둘 프레임 수
+
+    def __init__(self, root, on_frame, effect='none', duration_ms=400, fps=30,
+                 metrics=NO_METRICS):
+        self.root = root
+        self.on_frame = on_frame
+        self.effect = effect if effect in self.EFFECTS else 'none'
+        self.duration = duration_ms / 1000
+        self.fps = max(1, fps)
+        self.metrics = metrics
+        self.cond = threading.Condition()
+        self.generation = 0
+        self.job = None
+        self.on_done = None
+        self.frames = {}  # 단계 -> 준비된 전환 프레임
+        self.steps = 0
+        self.shown = -1
+        self.started = None
+        self.failed = False  # 프레임 생성 스레드가 실패하면 True
+        self.interval = 1 / self.fps
+    
+    def start(self, outgoing, incoming, box, on_done):
+        """outgoing에서 incoming으로 전환하고 끝나면 on_done() (효과가 없으면 바로)"""
+        self.finish()
+        if self.effect == 'none' or outgoing is None or self.duration <= 0:
+            on_done()
+            return
+        with self.cond:
+            self.generation += 1
+            generation = self.generation
+            self.frames = {}
+            self.steps = max(1, round(self.duration * self.fps))
+            self.shown = -1
+            self.started = None
+            self.failed = False
+        self.on_done = on_done
+        self.interval = 1 / self.fps
+        threading.Thread(target=self._render_frames, args=(generation, outgoing, incoming, box),
+                         name="transition", daemon=True).start()
+        self._arm(0)
+    
+    def finish(self):
+        """진행 중인 전환을 바로 끝내고 마지막 화면 표시"""
+        on_done = self.on_done
+        self.stop()
+        if on_done is not None:
+            on_done()
+    
+    def stop(self):
+        """전환 중지 (마지막 화면은 표시하지 않음)"""
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+        self.on_done = None
+        with self.cond:
+            self.generation += 1
+            self.frames = {}
+            self.cond.notify_all()
+    
+    def _arm(self, delay_ms):
+        self.job = self.root.after(delay_ms, self._tick)
+    
+    def _tick(self):
+        self.job = None
+        now = time.monotonic()
+        with self.cond:
+            failed = self.failed
+        if failed:
+            # 남은 프레임이 오지 않으므로 바로 다음 이미지 표시
+            self.finish()
+            return
+        with self.cond:
+            if self.started is None:
+                if 0 not in self.frames:
+                    # 첫 프레임이 준비되면 그때부터 시간을 잼
+                    self.job = self.root.after(1, self._tick)
+                    return
+                self.started = now
+            elapsed = now - self.started
+            if elapsed >= self.duration:
+                frame = None
+            else:
+                # 지금 시각에 맞는 단계까지 준비된 것 중 가장 늦은 프레임
+                target = min(self.steps - 1, int(elapsed / self.duration * self.steps))
+                ready = [step for step in self.frames if self.shown < step <= target]
+                frame = None
+                if ready:
+                    step = max(ready)
+                    frame = self.frames[step]
+                    dropped = step - self.shown - 1
+                    self.shown = step
+                    for old in [old for old in self.frames if old <= step]:
+                        del self.frames[old]
+                    self.cond.notify_all()
+        if elapsed >= self.duration:
+            self.finish()
+            return
+        
+        if frame is not None:
+            if dropped:
+                self.metrics.count('transition_dropped', dropped)
+            begin = time.perf_counter()
+            with self.metrics.stage('transition_frame'):
+                self.on_frame(frame)
+            if time.perf_counter() - begin > self.interval:
+                # 표시만으로 예산을 넘으면 프레임 수를 줄임 (전환 시간은 그대로)
+                self.interval = min(self.interval * 2, self.duration / 2)
+        
+        elapsed = time.monotonic() - self.started
+        delay = self.interval - elapsed % self.interval
+        self._arm(max(1, int(delay * 1000)))
+    
+    def _render_frames(self, generation, outgoing, incoming, box):
+        """(작업 스레드) 표시 위치보다 AHEAD장까지 전환 프레임 생성"""
+        try:
+            outgoing = self._on_canvas(outgoing, box)
+            incoming = self._on_canvas(incoming, box)
+            next_step = 0
+            while True:
+                with self.cond:
+                    while (generation == self.generation
+                           and next_step > self.shown + self.AHEAD):
+                        self.cond.wait()
+                    if generation != self.generation:
+                        return
+                    # 이미 지나간 단계는 만들지 않음
+                    if self.started is not None:
+                        elapsed = time.monotonic() - self.started
+                        next_step = max(next_step, int(elapsed / self.duration * self.steps))
+                    next_step = max(next_step, self.shown + 1)
+                    if next_step >= self.steps:
+                        return
+                    step = next_step
+                with self.metrics.stage('transition_render'):
+                    frame = self._blend(outgoing, incoming, (step + 1) / (self.steps + 1))
+                with self.cond:
+                    if generation != self.generation:
+                        return
+                    self.frames[step] = frame
+                next_step = step + 1
+        except Exception as e:
+            print(f"전환 효과 실패: {e}")
+            with self.cond:
+                if generation == self.generation:
+                    self.failed = True
+    
+    def _blend(self, outgoing, incoming, t):
+        # 처음과 끝을 부드럽게 (smoothstep)
+        t = t * t * (3 - 2 * t)
+        if self.effect == 'slide':
+            width = outgoing.width
+            offset = round(t * width)
+            frame = Image.new('RGB', outgoing.size)
+            frame.paste(outgoing, (-offset, 0))
+            frame.paste(incoming, (width - offset, 0))
+            return frame
+        return Image.blend(outgoing, incoming, t)
+    
+    @staticmethod
+    def _on_canvas(image, box):
+        """레이블처럼 검은 바탕 가운데에 놓은 box 크기 RGB 이미지"""
+        canvas = Image.new('RGB', box)
+        position = ((box[0] - image.width) // 2, (box[1] - image.height) // 2)
+        if 'A' in image.getbands() or 'transparency' in image.info:
+            rgba = image.convert('RGBA')
+            canvas.paste(rgba, position, rgba)
+        else:
+            canvas.paste(image.convert('RGB'), position)
+        return canvas
+
+# 슬라이드쇼에 포함하는 이미지 확장자 (위젯과 캐시 미리 만들기가 같은 규칙 사용)
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+
+
+def get_app_data_path():
+    """설정/캐시/인덱스를 저장하는 폴더 (없으면 생성)"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser("~"), ".local", "share")
+    app_data_path = os.path.join(base, "PhotoWidget")
+    if not os.path.exists(app_data_path):
+        os.makedirs(app_data_path)
+    return app_data_path
+
+
+def folder_index_for(app_data_path, folder_path, load=True, files=LOCAL_FILES):
+    """folder_path의 폴더 인덱스 (폴더마다 파일 하나)"""
+    name = os.path.normcase(os.path.abspath(folder_path))
+    key = hashlib.sha1(name.encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+    index_dir = os.path.join(app_data_path, "indexes")
+    if not os.path.exists(index_dir):
+        os.makedirs(index_dir)
+    index_file = os.path.join(index_dir, key + ".json")
+    return FolderIndex(index_file, IMAGE_EXTENSIONS, load, files)
+
+
+class SharedFolder:
+    """같은 폴더를 보여 주는 창들이 함께 쓰는 인덱스, 감시, 목록 열"""
+
+    def __init__(self, path, index, watcher, files):
+        self.path = path
+        self.index = index
+        self.watcher = watcher
+        self.files = files
+        self.widgets = []  # 이 폴더를 보여 주는 창
+        # 폴더의 모든 이미지 경로 (스캔 스레드가 준비해 메인 스레드로 넘긴 뒤로는 메인 스레드에서만 변경)
+        self.columns = None
+        self.columns_file = os.path.splitext(index.index_file)[0] + ".catalog"
+        self.columns_dirty = False
+        self.save_lock = threading.Lock()
+        self.scanning = False  # 스캔 스레드가 도는 중인지
+        self.growing = False  # 처음 스캔하는 폴더라 목록이 아직 자라는 중인지
+
+
+class WidgetEngine:
+    """한 프로세스에 띄운 여러 위젯 창이 함께 쓰는 부분
+    
+    Tk 루트(숨김), 디코딩 풀, 미리 읽기 스레드, 피라미드 캐시, 실패 기록,
+    공유 폴더 접근 계층, 폴더별 인덱스와 감시를 하나씩만 두고 창끼리 나눠
+    쓴다. 캐시 용량, 디코딩/미리 읽기 스레드 수, 애니메이션 프레임 예산은
+    창 수와 관계없이 전체 기준이다.
+    
+    설정 파일의 instances는 창마다 덮어쓸 설정 목록이다. 창 설정에 없는 값은
+    최상위 설정을 따르고, instances가 없으면 예전처럼 최상위 설정으로 창
+    하나를 띄운다.
+    """
+
+    def __init__(self):
+        self.root = tk.Tk()
+        self.root.withdraw()  # 창은 위젯마다 Toplevel로 띄움
+        
+        # 사용자 AppData 로컬 폴더에 설정/캐시/인덱스 저장
+        self.app_data_path = get_app_data_path()
+        self.config_file = os.path.join(self.app_data_path, "photo_widget_config.json")
+        self.config = self.load_config()
+        
+        # 디코딩 실행 방식 (파일 크기/형식에 따라 스레드 또는 프로세스)
+        self.decode_engine = DecodeEngine(
+            self.config.get('decode_engine', 'auto'),
+            process_min_bytes=self.config.get('process_decode_min_mb', 8) * 1024 * 1024)
+        
+        # 여러 해상도 피라미드 디스크 캐시 (인덱스는 백그라운드에서 읽음)
+        self.rendition_cache = PyramidCache(
+            os.path.join(self.app_data_path, "cache"),
+            self.config.get('cache_max_mb', 200) * 1024 * 1024, load=False)
+        threading.Thread(target=self.rendition_cache.load_index,
+                         name="cache-index", daemon=True).start()
+        
+        # 읽을 수 없는 파일 기록 (다시 시도하지 않고 건너뜀)
+        self.quarantine = QuarantineStore(os.path.join(self.app_data_path, "quarantine.json"))
+        
+        # 모든 창의 다음 이미지 미리 읽기를 같은 스레드들이 처리
+        self.prefetch_pool = ThreadPoolExecutor(
+            max_workers=self.config.get('prefetch_workers', 2), thread_name_prefix="prefetch")
+        
+        # 공유 폴더 접근 계층 (공유 폴더를 처음 열 때 생성)
+        self.storage = None
+        
+        # 폴더 경로 -> SharedFolder
+        self.folders = {}
+        self.folders_lock = threading.Lock()
+        
+        configs = self.instance_configs()
+        # 애니메이션 프레임 예산은 창 수로 나눔
+        self.animation_budget = (self.config.get('animation_budget_mb', 32) * 1024 * 1024
+                                 // len(configs))
+        self.widgets = []
+        for number, config in enumerate(configs):
+            self.widgets.append(PhotoWidget(self, config, number))
+    
+    def load_config(self):
+        """설정 파일 로드"""
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"설정 파일 로드 실패: {e}")
+        
+        # 기본 설정 반환
+        return {
+            'folder_path': '',
+            'auto_start': False,
+            'slideshow_interval': 5,
+            'width': 300,
+            'height': 200,
+            'x': None,
+            'y': None,
+            'alpha': 0.9,
+            'position': '우하단',
+            'position_locked': False,
+            'prefetch_depth': 3,
+            'cache_max_mb': 200,
+            'watch_folder': True,
+            'watch_poll_seconds': 30,
+            'lazy_shuffle': True,
+            'decode_engine': 'auto',
+            'process_decode_min_mb': 8,
+            'photo_filter': 'all',
+            'aspect_tolerance': 0.2,
+            'animation_budget_mb': 32,
+            'transition': 'none',
+            'transition_ms': 400,
+            'transition_fps': 30,
+            'storage_mode': 'auto',
+            'storage_timeout': 5,
+            'storage_readers': 4,
+            'read_ahead_mb': 64,
+            'read_ahead_depth': 8,
+            'prefetch_workers': 2
+        }
+    
+    
+    def save_config(self):
+        """설정 파일 저장 (창마다 현재 위치와 크기를 반영)"""
+        try:
+            for widget in self.widgets:
+                widget.store_geometry()
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(self.config, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            messagebox.showerror("오류", f"설정 저장 실패: {e}")
+    
+    def instance_configs(self):
+        """창마다 쓸 설정 (instances 항목이 최상위 설정을 덮어씀, 값을 바꾸면 창 설정에 저장)"""
+        instances = self.config.get('instances')
+        if not instances:
+            return [self.config]
+        for instance in instances[1:]:
+            # 두 번째 창부터는 위치와 섞기 순서를 따로 (없으면 새로 정함)
+            instance.setdefault('x', None)
+            instance.setdefault('y', None)
+            instance.setdefault('shuffle_folder', None)
+        return [ChainMap(instance, self.config) for instance in instances]
+    
+    def storage_for(self, folder_path):
+        """폴더 위치에 맞는 원본 접근 방식 (공유 폴더면 모든 창이 함께 쓰는 SlowStorage)"""
+        mode = self.config.get('storage_mode', 'auto')
+        if mode == 'local' or (mode == 'auto' and not is_network_path(folder_path)):
+            return LOCAL_FILES
+        if self.storage is None:
+            self.storage = SlowStorage(
+                timeout=self.config.get('storage_timeout', 5),
+                readers=self.config.get('storage_readers', 4),
+                read_ahead_bytes=self.config.get('read_ahead_mb', 64) * 1024 * 1024)
+        return self.storage
+    
+    def attach_folder(self, widget, folder_path):
+        """widget이 folder_path를 보여 주기 시작 (같은 폴더의 인덱스와 감시는 창끼리 공유)"""
+        with self.folders_lock:
+            shared = self.folders.get(folder_path)
+            if shared is None:
+                files = self.storage_for(folder_path)
+                index = folder_index_for(self.app_data_path, folder_path, load=False, files=files)
+                watcher = FolderWatcher(index, None,
+                                        poll_interval=self.config.get('watch_poll_seconds', 30))
+                shared = SharedFolder(folder_path, index, watcher, files)
+                watcher.on_changes = lambda added, removed: self.post_changes(
+                    shared, added, removed)
+                # 공유 폴더는 다른 컴퓨터의 변경이 inotify로 오지 않으므로 폴링만
+                watcher.use_inotify = files is LOCAL_FILES
+                self.folders[folder_path] = shared
+            shared.widgets.append(widget)
+        return shared
+    
+    def detach_folder(self, widget, shared):
+        """widget이 shared 폴더를 그만 보여 줌 (보는 창이 없으면 감시를 멈추고 목록 열 저장)"""
+        with self.folders_lock:
+            if widget in shared.widgets:
+                shared.widgets.remove(widget)
+            if shared.widgets:
+                return
+            if self.folders.get(shared.path) is shared:
+                del self.folders[shared.path]
+        shared.watcher.stop()
+        self.save_columns(shared)
+    
+    def watch_folder(self, shared):
+        """폴더 감시 시작 (이미 감시 중이면 그대로)"""
+        if shared.watcher.thread is None:
+            shared.watcher.start(shared.path)
+    
+    def scan_folder(self, shared):
+        """폴더 스캔 시작 (같은 폴더를 보는 창끼리 하나)
+        
+        스캔 스레드가 목록 열을 준비해 넘긴 뒤 찾은 변경분을 그 폴더를 보는 모든 창에
+        전달하므로, 스캔 중에 연 창은 새로 스캔하지 않고 앞 창의 스캔이 끝나기를
+        기다리지도 않는다.
+        """
+        if shared.scanning:
+            return
+        shared.scanning = True
+        threading.Thread(target=self.run_scan, args=(shared,),
+                         name="folder-scan", daemon=True).start()
+    
+    def run_scan(self, shared):
+        """(스캔 스레드) 목록 열을 준비하고 인덱스를 갱신하면서 변경분을 메인 스레드로 전달"""
+        folder_index = shared.index
+        stopped = lambda: not shared.widgets
+        added = []
+        removed = []
+        dir_mtimes = None
+        aborted = False
+        try:
+            # 같은 폴더 감시의 변경분과 순서가 섞이지 않게
+            with folder_index.scan_lock:
+                folder_index.ensure_loaded()
+                if shared.columns is None:
+                    columns = self.prepare_columns(shared)
+                    self.root.after(0, lambda: self.publish_columns(shared, columns))
+                last_post = None
+                for batch_added, batch_removed in folder_index.iter_refresh(shared.path):
+                    if self.filtering(shared):
+                        # 필터를 쓰는 창이 있으면 전달하기 전에 새 파일의 헤더 정보부터 읽음
+                        folder_index.fill_metadata(batch_added, stopped)
+                    added.extend(batch_added)
+                    removed.extend(batch_removed)
+                    # 첫 묶음은 바로, 이후는 0.1초마다 모아서 전달
+                    now = time.monotonic()
+                    if last_post is None or now - last_post >= 0.1:
+                        self.post_scan_changes(shared, added, removed)
+                        added, removed = [], []
+                        last_post = now
+                # 이 스캔의 변경분을 모두 반영하면 목록 열은 지금 인덱스와 같아짐
+                dir_mtimes = folder_index.dir_mtimes()
+                self.post_scan_changes(shared, added, removed, dir_mtimes)
+        except StorageUnavailable as e:
+            # 인덱스는 그대로 두고, 찾은 만큼만 반영한 뒤 연결이 돌아오면 다시 스캔
+            print(f"폴더 스캔 중단: {shared.path}, 오류: {e}")
+            aborted = True
+            self.post_scan_changes(shared, added, removed)
+        except Exception as e:
+            print(f"폴더 스캔 실패: {shared.path}, 오류: {e}")
+            self.post_scan_changes(shared, added, removed)
+        filtering = self.filtering(shared)
+        filled = []
+        if filtering:
+            # 헤더 정보가 없어 필터를 쓰는 창의 목록에서 빠졌던 기존 파일
+            filled = folder_index.fill_metadata(None, stopped)
+        folder_index.save()
+        self.root.after(0, lambda: self.finish_scan(shared, aborted, filled))
+        
+        if not filtering:
+            # 나중에 필터를 켜도 바로 쓸 수 있게 남은 헤더 정보를 천천히 채움
+            if folder_index.fill_metadata(None, stopped):
+                folder_index.save()
+    
+    def prepare_columns(self, shared):
+        """(스캔 스레드, 스캔 잠금 안) 저장된 목록 열 또는 인덱스로 목록 열을 만들어 반환
+        
+        저장된 열은 저장 뒤 수정 시각이 바뀐 디렉터리만 지금 인덱스와 비교해 맞춘다.
+        인덱스가 없으면 빈 열로 시작해 스캔이 찾는 대로 채운다.
+        """
+        folder_index = shared.index
+        if folder_index.root != shared.path:
+            shared.growing = True
+            return CatalogColumns()
+        columns = self.load_columns(shared)
+        if columns is None:
+            return folder_index.build_columns()
+        added, removed = folder_index.catalog_changes(columns)
+        columns.remove(removed)
+        columns.add_new(added)
+        columns.dir_mtimes = folder_index.dir_mtimes()
+        if added or removed:
+            shared.columns_dirty = True
+        return columns
+    
+    def load_columns(self, shared):
+        """저장해 둔 shared 폴더의 목록 열 (없거나 다른 폴더 것이면 None)"""
+        try:
+            with open(shared.columns_file, 'rb') as f:
+                columns, extra = CatalogColumns.from_bytes(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"저장된 목록 로드 실패: {e}")
+            return None
+        if extra.get('folder') != shared.path:
+            return None
+        return columns
+    
+    def filtering(self, shared):
+        """shared 폴더를 보는 창 중 사진 필터를 쓰는 창이 있는지"""
+        return any(widget.active_filter is not None for widget in list(shared.widgets))
+    
+    def post_scan_changes(self, shared, added, removed, dir_mtimes=None):
+        """(스캔 스레드) 변경분을 메인 스레드의 목록 열과 창들에 전달"""
+        if added or removed or dir_mtimes is not None:
+            self.root.after(0, lambda: self.apply_changes(shared, added, removed, dir_mtimes))
+    
+    def post_changes(self, shared, added, removed):
+        """(감시 스레드, 스캔 잠금 안) 감시가 찾은 변경분 전달"""
+        if self.filtering(shared):
+            # 헤더 정보는 보낸 스레드에서 미리 읽어 둠
+            shared.index.fill_metadata(added)
+        dir_mtimes = shared.index.dir_mtimes()
+        self.root.after(0, lambda: self.apply_changes(shared, added, removed, dir_mtimes, True))
+    
+    def publish_columns(self, shared, columns):
+        """스캔 스레드가 준비한 목록 열을 넘겨받아 그 폴더를 보는 창들의 목록을 만듦"""
+        shared.columns = columns
+        for widget in list(shared.widgets):
+            widget.receive_columns()
+    
+    def apply_changes(self, shared, added, removed, dir_mtimes=None, watched=False):
+        """변경분을 목록 열에 한 번만 반영하고 창마다 자기 순서에 반영
+        
+        dir_mtimes는 변경분까지 반영했을 때 목록 열이 맞춰진 디렉터리 수정 시각.
+        watched이면 폴더 감시가 찾은 변경분.
+        """
+        columns = shared.columns
+        if columns is None or not shared.widgets:
+            return
+        if watched and shared.files is LOCAL_FILES:
+            # 반영 전에 다시 지워진 파일은 제외 (공유 폴더는 메인 스레드에서 확인하지 않음)
+            added = [path for path in added if os.path.exists(path)]
+        removed_entries = columns.remove(removed)
+        added_entries = columns.add_new(added)
+        if added_entries or removed_entries:
+            shared.columns_dirty = True
+        if dir_mtimes is not None and dir_mtimes != columns.dir_mtimes:
+            columns.dir_mtimes = dir_mtimes
+            shared.columns_dirty = True
+        for widget in list(shared.widgets):
+            widget.apply_entries(added_entries, removed_entries)
+        if watched:
+            print(f"폴더 변경 반영: 추가 {len(added)}, 삭제 {len(removed)}")
+        
+        # 지운 항목이 절반을 넘으면 열을 다시 만들어 메모리 회수 (목록을 만드는 중인 창이 없을 때)
+        if columns.needs_compact() and not any(widget.view_pending for widget in shared.widgets):
+            mapping = columns.compact()
+            for widget in list(shared.widgets):
+                widget.remap_entries(mapping)
+            shared.columns_dirty = True
+    
+    def finish_scan(self, shared, aborted, filled):
+        """스캔 스레드가 끝난 뒤 창들에 알리고 감시 시작 (또는 중단된 스캔 다시 시도)
+        
+        filled는 필터를 쓰는 창을 위해 스캔 끝에 헤더 정보를 새로 읽은 파일.
+        """
+        shared.scanning = False
+        shared.growing = False
+        if not shared.widgets:
+            self.save_columns(shared)
+            return
+        stats = None if aborted else shared.index.get_stats()
+        for widget in list(shared.widgets):
+            widget.scan_finished(stats, filled)
+        
+        # 폴더 감시 시작 (같은 폴더를 보는 창끼리 하나, 공유 폴더는 폴링이므로
+        # 중단된 스캔의 나머지도 연결이 돌아온 뒤 감시가 반영)
+        if any(widget.config.get('watch_folder', True) for widget in shared.widgets):
+            self.watch_folder(shared)
+        elif aborted:
+            self.root.after(int(shared.files.retry_seconds * 1000),
+                            lambda: self.retry_scan(shared))
+        
+        # 다음 시작 때 바로 쓸 수 있게 완성된 목록 열 저장
+        self.save_columns(shared)
+    
+    def retry_scan(self, shared):
+        """감시를 쓰지 않을 때 중단된 스캔을 다시 시도 (그 사이 아무 창도 보지 않게 되었으면 무시)"""
+        if self.folders.get(shared.path) is shared:
+            self.scan_folder(shared)
+    
+    def save_columns(self, shared, wait=False):
+        """바뀐 목록 열을 저장 (파일 쓰기는 백그라운드 스레드에서)"""
+        if shared is None or shared.columns is None or not shared.columns_dirty:
+            return
+        data = shared.columns.to_bytes({'folder': shared.path})
+        shared.columns_dirty = False
+        writer = threading.Thread(target=self.write_columns, args=(shared, data),
+                                  name="catalog-save", daemon=not wait)
+        writer.start()
+        if wait:
+            writer.join()
+    
+    def write_columns(self, shared, data):
+        """(백그라운드) 목록 열 파일 쓰기 (임시 파일에 쓴 뒤 바꿔 넣음)"""
+        with shared.save_lock:
+            try:
+                temp_file = shared.columns_file + ".tmp"
+                with open(temp_file, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_file, shared.columns_file)
+            except Exception as e:
+                print(f"목록 저장 실패: {e}")
+    
+    def run(self):
+        """프로그램 실행"""
+        try:
+            self.root.mainloop()
+        finally:
+            # 프로그램 종료시 설정 저장
+            for shared in list(self.folders.values()):
+                shared.watcher.stop()
+            for widget in self.widgets:
+                widget.close()
+            for shared in list(self.folders.values()):
+                self.save_columns(shared, wait=True)
+            self.prefetch_pool.shutdown(wait=False, cancel_futures=True)
+            self.decode_engine.shutdown()
+            self.rendition_cache.save_index()
+            self.quarantine.save()
+            self.save_config()
+
 
 class PhotoWidget:
-    def __init__(self):
-        self.root = tk.Tk()
+    # 한 번 전환할 때 건너뛸 수 있는 최대 파일 수 (읽을 수 없는 파일이 많은 폴더 대비)
+    MAX_SKIPS_PER_TICK = 20
+    
+    # 크기 조절 중 미리보기 갱신 간격과 고화질로 다시 그리기까지 기다릴 시간 (ms)
+    RESIZE_PREVIEW_MS = 16
+    RESIZE_SETTLE_MS = 250
+    
+    # 표시할 사진 필터 (설정값 -> 표시 이름)
+    PHOTO_FILTERS = {
+        'all': '모든 사진',
+        'landscape': '가로 사진만',
+        'portrait': '세로 사진만',
+        'fits_aspect': '위젯 비율에 맞는 사진만',
+        'on_this_day': '오늘 날짜에 찍은 사진만',
+    }
+    
+    # 시작 화면 스냅샷을 다시 저장하는 최소 간격 (초)
+    SNAPSHOT_INTERVAL = 60
+    
+    # 전환 효과 (설정값 -> 표시 이름)
+    TRANSITIONS = {
+        'none': '없음',
+        'crossfade': '크로스페이드',
+        'slide': '슬라이드',
+    }
+    
+    def __init__(self, engine, config, number=0):
+        """engine: 창끼리 함께 쓰는 WidgetEngine, config: 이 창의 설정, number: 창 번호"""
+        self.engine = engine
+        self.root = tk.Toplevel(engine.root)
         self.root.title("포토위젯")
         
-        # 설정 파일 경로 및 설정 로드 (가장 먼저)
-        # 사용자 AppData 로컬 폴더에 설정 파일을 저장하도록 변경
-        app_data_path = os.path.join(os.environ['LOCALAPPDATA'], "PhotoWidget")
-        if not os.path.exists(app_data_path):
-            os.makedirs(app_data_path)
-        self.config_file = os.path.join(app_data_path, "photo_widget_config.json")
-        # ---------------------------
-
-        self.config = self.load_config()
+        # 시작하자마자 보여 줄 마지막 화면과 목록 (창마다 따로, 첫 창은 예전 이름 그대로)
+        app_data_path = engine.app_data_path
+        suffix = f"-{number}" if number else ""
+        self.snapshot_file = os.path.join(app_data_path, f"snapshot{suffix}.json")
+        self.snapshot_image_file = os.path.join(app_data_path, f"snapshot{suffix}.png")
+        self.catalog_file = os.path.join(app_data_path, f"catalog{suffix}.bin")
+        
+        self.config = config
         
         # 위치 잠금 상태 초기화 (UI 생성 전에 먼저)
         self.position_locked = self.config.get('position_locked', False)
@@ -37,11 +3067,11 @@ class PhotoWidget:
         x = self.config.get('x', None)
         y = self.config.get('y', None)
         
-        # 위치가 저장되어 있지 않으면 우하단으로
+        # 위치가 저장되어 있지 않으면 우하단으로 (두 번째 창부터는 그 왼쪽에 나란히)
         if x is None or y is None:
             screen_width = self.root.winfo_screenwidth()
             screen_height = self.root.winfo_screenheight()
-            x = screen_width - width - 20
+            x = max(0, screen_width - (width + 20) * (number + 1))
             y = screen_height - height - 70
         
         self.root.geometry(f"{width}x{height}+{x}+{y}")
@@ -53,12 +3083,77 @@ class PhotoWidget:
         self.root.configure(bg='black')  # 검은색 배경
         
         # 지원하는 이미지 확장자
-        self.image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+        self.image_extensions = IMAGE_EXTENSIONS
         
         # 현재 이미지 목록과 인덱스
-        self.image_files = []
+        self.image_files = ImageCatalog()
         self.current_index = 0
         self.current_image = None
+        self.current_rendition = None  # 현재 표시 중인 PIL 이미지
+        
+        # 슬라이드쇼 타이머 (숨김 상태이거나 이미지가 없으면 멈춤)
+        self.slideshow = SlideshowScheduler(
+            self.root, self.next_image, self.config.get('slideshow_interval', 5),
+            lambda: bool(self.image_files) and not self.is_hidden)
+        
+        # 원본 파일 접근 (공유 폴더면 제한 시간이 있는 SlowStorage, 폴더를 정할 때 선택)
+        self.files = LOCAL_FILES
+        
+        # 폴더 인덱스와 감시 (같은 폴더를 보는 창끼리 공유, 인덱스 읽기는 스캔 스레드에서)
+        self.shared_folder = None
+        self.folder_index = None
+        self.loaded_folder = None
+        self.scan_generation = 0
+        self.scan_in_progress = False
+        self.view_pending = False  # 목록 열에서 이 창의 목록을 만드는 중인지
+        self.active_filter = None  # 목록을 만들 때 적용한 사진 필터
+        
+        # 지연 섞기 순서 (재시작해도 이어서 진행)
+        self.lazy_shuffle = self.config.get('lazy_shuffle', True)
+        self.shuffle_order = LazyShuffle(self.config.get('shuffle_seed'),
+                                         self.config.get('shuffle_position', 0),
+                                         self.config.get('shuffle_half_bits', 1))
+        self.load_started = None  # 첫 이미지 표시까지 걸린 시간 측정용
+        self.time_to_first_image = None
+        self.time_to_first_paint = None  # 프로그램 시작부터 첫 화면까지
+        
+        # 시작 스냅샷 (지난번 마지막 화면을 먼저 보여 주고 스캔/디코딩은 뒤에서)
+        self.snapshot = None
+        self.snapshot_painted = False  # 스냅샷 화면이 아직 떠 있는지
+        self.snapshot_saved_at = None
+        self.snapshot_lock = threading.Lock()
+        self.catalog_dirty = False  # 마지막으로 저장한 뒤 목록이 바뀌었는지
+        
+        # 읽을 수 없는 파일 기록 (다시 시도하지 않고 건너뜀, 창끼리 공유)
+        self.quarantine = engine.quarantine
+        self.skipped_count = 0
+        
+        # 단계별 소요 시간 측정 (통계 표시를 켰을 때만)
+        self.metrics = StageMetrics(enabled=self.config.get('show_stats', False))
+        self.stats_overlay = None
+        self.stats_job = None
+        
+        # 디코딩 실행 방식과 피라미드 디스크 캐시 (창끼리 공유)
+        self.decode_engine = engine.decode_engine
+        self.rendition_cache = engine.rendition_cache
+        
+        # 다음 이미지 미리 읽기 (메인 스레드 멈춤 방지, 작업 스레드는 창끼리 공유)
+        self.prefetcher = ImagePrefetcher(self.load_rendition,
+                                          depth=self.config.get('prefetch_depth', 3),
+                                          executor=engine.prefetch_pool)
+        
+        # 움직이는 이미지 재생 (숨겼거나 크기 조절 중이면 멈춤, 예산은 전체를 창 수로 나눈 몫)
+        self.animation = AnimationPlayer(
+            self.root, self.show_frame,
+            lambda: not self.is_hidden and self.resize_source is None,
+            engine.animation_budget, self.metrics)
+        self.frame_photo = None  # 프레임마다 다시 쓰는 PhotoImage
+        
+        # 이미지 전환 효과
+        self.transition = TransitionPlayer(
+            self.root, self.show_frame, self.config.get('transition', 'none'),
+            self.config.get('transition_ms', 400), self.config.get('transition_fps', 30),
+            self.metrics)
         
         # 툴팁 초기화
         self.tooltip = None
@@ -69,6 +3164,12 @@ class PhotoWidget:
         # 드래그 이동 가능하게 설정 (UI 생성 후)
         self.setup_drag_move()
         
+        if self.config.get('show_stats', False):
+            self.toggle_stats_overlay()
+        
+        # 지난번 마지막 화면부터 표시
+        self.paint_snapshot()
+        
         # 폴더가 설정되어 있으면 이미지 로드
         if self.config.get('folder_path'):
             self.load_images()
@@ -102,7 +3203,10 @@ class PhotoWidget:
         self.context_menu.add_command(label="폴더 선택", command=self.select_folder)
         self.context_menu.add_command(label="설정", command=self.open_settings)
         self.context_menu.add_separator()
+        self.context_menu.add_command(label="슬라이드쇼 일시정지/재개", command=self.slideshow.toggle_pause)
         self.context_menu.add_command(label="위치 잠금/해제", command=self.toggle_position_lock)
+        self.context_menu.add_command(label="통계 표시/숨기기", command=self.toggle_stats_overlay)
+        self.context_menu.add_command(label="통계 내보내기...", command=self.export_stats)
         self.context_menu.add_command(label="위젯 숨기기", command=self.hide_widget)
         self.context_menu.add_command(label="종료", command=self.root.quit)
     
@@ -153,6 +3257,47 @@ class PhotoWidget:
         self.lock_icon.bind("<Enter>", on_enter)
         self.lock_icon.bind("<Leave>", on_leave)
     
+    def toggle_stats_overlay(self):
+        """단계별 소요 시간 오버레이 표시/숨기기 (숨기면 측정도 멈춤)"""
+        show = self.stats_overlay is None
+        self.config['show_stats'] = show
+        self.metrics.enabled = show
+        if show:
+            self.stats_overlay = tk.Label(self.root, bg='black', fg='lime',
+                                          font=('Consolas', 8), justify=tk.LEFT, anchor='w')
+            self.stats_overlay.place(relx=0.0, rely=1.0, anchor='sw', x=2, y=-2)
+            self.update_stats_overlay()
+        else:
+            if self.stats_job is not None:
+                self.root.after_cancel(self.stats_job)
+                self.stats_job = None
+            self.stats_overlay.destroy()
+            self.stats_overlay = None
+    
+    def update_stats_overlay(self):
+        """오버레이 내용 갱신 (1초마다)"""
+        summary = self.metrics.summary()
+        lines = [f"{name:<13}{values['p50_ms']:>7.1f}{values['p95_ms']:>7.1f} ms"
+                 for name, values in summary['stages'].items()]
+        counters = summary['counters']
+        lines.append(f"캐시 {counters.get('cache_hit', 0)}/{counters.get('cache_miss', 0)}  "
+                     f"미리읽기 {counters.get('prefetch_hit', 0)}/{counters.get('prefetch_miss', 0)}  "
+                     f"건너뜀 {self.skipped_count}")
+        self.stats_overlay.configure(text="단계          p50    p95\n" + "\n".join(lines))
+        self.stats_job = self.root.after(1000, self.update_stats_overlay)
+    
+    def export_stats(self):
+        """측정한 통계를 JSON/CSV 파일로 저장"""
+        file_path = filedialog.asksaveasfilename(
+            title="통계 내보내기", defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+        if not file_path:
+            return
+        try:
+            self.metrics.export(file_path)
+        except Exception as e:
+            messagebox.showerror("오류", f"통계 저장 실패: {e}")
+    
     def update_lock_icon(self):
         """잠금 상태에 따라 아이콘 업데이트"""
         if self.position_locked:
@@ -188,6 +3333,13 @@ class PhotoWidget:
         self.resize_start_width = 0
         self.resize_start_height = 0
         
+        # 드래그 중 미리보기에 쓸 메모리 속 원본과 예약된 작업
+        self.resize_source = None
+        self.resize_drag = 0  # 드래그마다 1씩 (끝난 드래그의 늦은 원본은 버림)
+        self.resize_preview_box = None
+        self.resize_preview_job = None
+        self.resize_settle_job = None
+        
         def do_resize(event):
             if self.position_locked:
                 return
@@ -202,9 +3354,9 @@ class PhotoWidget:
             # 크기 조절
             self.root.geometry(f"{new_width}x{new_height}")
             
-            # 현재 이미지가 있다면 다시 표시 (크기에 맞게 조정)
+            # 현재 이미지가 있다면 드래그 중에는 빠른 미리보기만 표시
             if self.current_image:
-                self.display_image(self.current_image)
+                self.schedule_resize_preview((new_width, new_height))
         
         def start_resize(event):
             if self.position_locked:
@@ -213,6 +3365,7 @@ class PhotoWidget:
             self.resize_start_y = event.y_root
             self.resize_start_width = self.root.winfo_width()
             self.resize_start_height = self.root.winfo_height()
+            self.begin_resize_preview()
         
         # 크기 조절 핸들에 이벤트 바인딩
         self.resize_handle.bind("<Button-1>", start_resize)
@@ -228,6 +3381,60 @@ class PhotoWidget:
         self.resize_handle.bind("<Enter>", on_enter)
         self.resize_handle.bind("<Leave>", on_leave)
     
+    def begin_resize_preview(self):
+        """드래그 미리보기용 원본 준비 (우선 현재 표시 중인 이미지, 이어서 화면 크기 이미지)"""
+        if not self.current_image or self.resize_source is not None:
+            return
+        self.resize_source = self.current_rendition
+        self.transition.finish()
+        self.animation.update()
+        image_path = self.current_image
+        drag = self.resize_drag
+        screen_box = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+        
+        def use_source(future):
+            # (Tk 스레드) 드래그가 끝났거나 이미지가 바뀌었으면 버림
+            if (future.exception() is None and self.resize_drag == drag
+                    and self.current_image == image_path):
+                self.resize_source = future.result()
+        
+        # 화면 크기를 덮는 피라미드 단계를 그대로 사용 (축소는 드래그 중에)
+        future = self.prefetcher.executor.submit(self.load_rendition, image_path, screen_box, False)
+        future.add_done_callback(lambda future: self.root.after(0, lambda: use_source(future)))
+    
+    def schedule_resize_preview(self, box):
+        """미리보기는 화면 갱신 주기에 맞춰 한 번만, 고화질은 크기가 멈춘 뒤에 그리도록 예약"""
+        self.resize_preview_box = box
+        if self.resize_preview_job is None:
+            self.resize_preview_job = self.root.after(self.RESIZE_PREVIEW_MS,
+                                                      self.render_resize_preview)
+        
+        if self.resize_settle_job is not None:
+            self.root.after_cancel(self.resize_settle_job)
+        self.resize_settle_job = self.root.after(self.RESIZE_SETTLE_MS, self.finish_resize)
+    
+    def render_resize_preview(self):
+        """메모리 속 원본에서 BILINEAR로 빠르게 축소해 표시"""
+        self.resize_preview_job = None
+        source = self.resize_source
+        if source is None:
+            return
+        size = fit_size(source.size, self.resize_preview_box, upscale=True)
+        photo = ImageTk.PhotoImage(source.resize(size, Image.Resampling.BILINEAR))
+        self.image_label.configure(image=photo, text="")
+        self.image_label.image = photo  # 참조 유지
+    
+    def finish_resize(self):
+        """크기 변경이 끝나면 고화질로 한 번 다시 그림"""
+        self.resize_settle_job = None
+        if self.resize_preview_job is not None:
+            self.root.after_cancel(self.resize_preview_job)
+            self.resize_preview_job = None
+        self.resize_source = None
+        self.resize_drag += 1
+        if self.current_image:
+            self.display_image(self.current_image)
+    
     def hide_widget(self):
         """위젯 숨기기/보이기"""
         if self.is_hidden:
@@ -236,51 +3443,28 @@ class PhotoWidget:
         else:
             self.root.withdraw()
             self.is_hidden = True
+            self.transition.finish()
             # 5초 후 자동으로 다시 보이기
             self.root.after(5000, lambda: self.show_widget())
-    
-    def load_config(self):
-        """설정 파일 로드"""
-        try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"설정 파일 로드 실패: {e}")
-        
-        # 기본 설정 반환
-        return {
-            'folder_path': '',
-            'auto_start': False,
-            'slideshow_interval': 5,
-            'width': 300,
-            'height': 200,
-            'x': None,
-            'y': None,
-            'alpha': 0.9,
-            'position': '우하단',
-            'position_locked': False
-        }
+        self.slideshow.update()
+        self.animation.update()
     
     def save_config(self):
-        """설정 파일 저장"""
-        try:
-            # 현재 위치와 크기 저장
-            geometry = self.root.geometry()
-            # geometry 형식: "widthxheight+x+y"
-            size_pos = geometry.split('+')
-            if len(size_pos) >= 3:
-                width_height = size_pos[0].split('x')
-                if len(width_height) == 2:
-                    self.config['width'] = int(width_height[0])
-                    self.config['height'] = int(width_height[1])
-                    self.config['x'] = int(size_pos[1])
-                    self.config['y'] = int(size_pos[2])
-            
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            messagebox.showerror("오류", f"설정 저장 실패: {e}")
+        """설정 파일 저장 (모든 창의 설정이 한 파일에 있음)"""
+        self.engine.save_config()
+    
+    def store_geometry(self):
+        """현재 창 위치와 크기를 설정에 반영"""
+        # geometry 형식: "widthxheight+x+y"
+        geometry = self.root.geometry()
+        size_pos = geometry.split('+')
+        if len(size_pos) >= 3:
+            width_height = size_pos[0].split('x')
+            if len(width_height) == 2:
+                self.config['width'] = int(width_height[0])
+                self.config['height'] = int(width_height[1])
+                self.config['x'] = int(size_pos[1])
+                self.config['y'] = int(size_pos[2])
     
     def select_folder(self):
         """폴더 선택"""
@@ -291,71 +3475,566 @@ class PhotoWidget:
             self.load_images()
             self.start_slideshow()
     
+    def paint_snapshot(self):
+        """지난번 마지막 화면을 저장해 둔 PNG로 바로 표시 (PIL 디코딩 없이)"""
+        folder_path = self.config.get('folder_path')
+        if not folder_path:
+            return
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('folder') != os.path.abspath(folder_path):
+                return
+            photo = tk.PhotoImage(file=self.snapshot_image_file)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"시작 화면 로드 실패: {e}")
+            return
+        self.image_label.configure(image=photo, text="")
+        self.image_label.image = photo  # 참조 유지
+        self.snapshot = snapshot
+        self.snapshot_painted = True
+        self.current_image = snapshot.get('image')
+        if snapshot.get('shuffle') and snapshot.get('lazy_shuffle') == self.lazy_shuffle:
+            # 비정상 종료로 설정에 못 남긴 섞기 위치까지 이어서
+            state = snapshot['shuffle']
+            self.shuffle_order = LazyShuffle(state.get('shuffle_seed'),
+                                             state.get('shuffle_position', 0),
+                                             state.get('shuffle_half_bits', 1))
+            self.config.update(self.shuffle_order.state())
+        self.mark_first_paint()
+    
+    def mark_first_paint(self):
+        """프로그램 시작부터 첫 화면이 그려질 때까지의 시간 기록 (한 번만)"""
+        if self.time_to_first_paint is not None:
+            return
+        self.root.update_idletasks()
+        self.time_to_first_paint = time.perf_counter() - STARTED_AT
+        self.metrics.record('first_paint', self.time_to_first_paint)
+        source = "스냅샷" if self.snapshot_painted else "디코딩"
+        print(f"첫 화면 표시까지: {self.time_to_first_paint * 1000:.0f}ms ({source})")
+    
+    def load_catalog_snapshot(self, folder_path, columns):
+        """저장해 둔 이 창의 순서를 (목록, 저장할 때의 목록 열 항목 수)로 반환
+        
+        같은 폴더/필터/섞기 방식이고 columns에 맞춰 저장한 순서일 때만 (아니면 None).
+        """
+        try:
+            with open(self.catalog_file, 'rb') as f:
+                order, header = ImageCatalog.order_from_bytes(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"저장된 목록 로드 실패: {e}")
+            return None
+        extra = header['extra']
+        if (extra.get('folder') != folder_path
+                or extra.get('filter') != self.config.get('photo_filter', 'all')
+                or extra.get('lazy_shuffle') != self.lazy_shuffle
+                or header['token'] != columns.token):
+            return None
+        return ImageCatalog(columns=columns, order=order), header['entries']
+    
+    def save_snapshot(self, wait=False):
+        """지금 화면과 목록/섞기 상태를 저장 (파일 쓰기는 백그라운드 스레드에서)"""
+        image = self.current_rendition
+        if image is None or not self.loaded_folder:
+            return
+        self.snapshot_saved_at = time.monotonic()
+        state = {
+            'folder': self.loaded_folder,
+            'image': self.current_image,
+            'lazy_shuffle': self.lazy_shuffle,
+            'shuffle': self.shuffle_order.state(),
+        }
+        catalog = None
+        if self.catalog_dirty and not self.view_pending:
+            # 폴더의 경로는 함께 쓰는 목록 열에 있고, 창마다 순서만 저장
+            catalog = self.image_files.to_bytes({
+                'folder': self.loaded_folder,
+                'filter': self.config.get('photo_filter', 'all'),
+                'lazy_shuffle': self.lazy_shuffle,
+            })
+            self.catalog_dirty = False
+        self.engine.save_columns(self.shared_folder, wait)
+        writer = threading.Thread(target=self.write_snapshot, args=(image, state, catalog),
+                                  name="snapshot-save", daemon=not wait)
+        writer.start()
+        if wait:
+            writer.join()
+    
+    def write_snapshot(self, image, state, catalog):
+        """(백그라운드) 스냅샷 파일 쓰기 (임시 파일에 쓴 뒤 바꿔 넣음)"""
+        with self.snapshot_lock:
+            try:
+                temp_file = self.snapshot_image_file + ".tmp"
+                image.save(temp_file, 'PNG', compress_level=1)
+                os.replace(temp_file, self.snapshot_image_file)
+                temp_file = self.snapshot_file + ".tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(temp_file, self.snapshot_file)
+                if catalog is not None:
+                    temp_file = self.catalog_file + ".tmp"
+                    with open(temp_file, 'wb') as f:
+                        f.write(catalog)
+                    os.replace(temp_file, self.catalog_file)
+            except Exception as e:
+                print(f"시작 화면 저장 실패: {e}")
+    
     def load_images(self):
-        """폴더에서 이미지 파일 로드"""
-        self.image_files = []
+        """폴더에서 이미지 파일 로드
+        
+        같은 폴더를 보는 창들은 폴더의 목록 열(CatalogColumns)과 스캔을 함께 쓰고,
+        창마다 필터와 순서만 따로 만든다. 스캔은 백그라운드 스레드에서 진행하고,
+        찾는 즉시 조금씩 목록에 넣어 첫 이미지는 스캔이 끝나기 전에 표시한다.
+        이전에 스캔한 폴더이면 저장해 둔 목록 열과 이 창의 순서를 바로 쓰고 바뀐
+        부분만 나중에 반영한다.
+        """
         folder_path = self.config.get('folder_path')
         
-        if not folder_path or not os.path.exists(folder_path):
+        # 만드는 중인 이전 목록은 무시
+        self.scan_generation += 1
+        
+        files = LOCAL_FILES
+        if folder_path:
+            folder_path = os.path.abspath(folder_path)
+            files = self.engine.storage_for(folder_path)
+        # 공유 폴더는 여기서 존재 확인을 하지 않음 (연결이 멈추면 화면이 멈추므로 스캔 스레드에서)
+        if not folder_path or (files is LOCAL_FILES and not os.path.exists(folder_path)):
+            self.image_files = ImageCatalog()
+            self.view_pending = False
+            self.loaded_folder = None
+            self.release_folder()
             return
         
-        # 폴더와 하위폴더에서 이미지 파일 검색
-        for root_dir, dirs, files in os.walk(folder_path):
-            for file in files:
-                if os.path.splitext(file.lower())[1] in self.image_extensions:
-                    self.image_files.append(os.path.join(root_dir, file))
+        if self.loaded_folder != folder_path:
+            self.load_started = time.perf_counter()
+            # 목록이 바뀌었으므로 미리 읽던 이미지는 버림
+            self.prefetcher.clear()
+            if self.shared_folder is None or self.shared_folder.path != folder_path:
+                self.release_folder()
+                self.shared_folder = self.engine.attach_folder(self, folder_path)
+            self.folder_index = self.shared_folder.index
+            self.files = self.shared_folder.files
+            self.loaded_folder = folder_path
+            self.current_index = 0
+            if self.snapshot_painted and self.snapshot.get('folder') != folder_path:
+                # 시작 화면과 다른 폴더로 바꾸면 바로 새 폴더의 이미지를 표시
+                self.snapshot_painted = False
+            self.active_filter = self.photo_filter()
+            self.image_files = ImageCatalog()
+            self.view_pending = False
+            self.scan_in_progress = False
+            if self.lazy_shuffle and self.config.get('shuffle_folder') != folder_path:
+                # 다른 폴더로 바뀌면 새 순서로 시작
+                self.shuffle_order = LazyShuffle()
+                self.config['shuffle_folder'] = folder_path
+                self.config.update(self.shuffle_order.state())
+            if self.shared_folder.columns is not None:
+                # 같은 폴더를 보는 다른 창이 이미 준비한 목록 열로 바로 목록을 만듦
+                self.receive_columns()
         
-        if self.image_files:
-            random.shuffle(self.image_files)  # 랜덤 순서로 섞기
-            print(f"로드된 이미지 파일 수: {len(self.image_files)}")
+        self.engine.scan_folder(self.shared_folder)
     
-    def display_image(self, image_path):
-        """이미지 표시"""
+    def release_folder(self):
+        """보여 주던 폴더에서 빠짐 (그 폴더를 보는 창이 없으면 감시도 멈춤)"""
+        if self.shared_folder is not None:
+            self.engine.detach_folder(self, self.shared_folder)
+            self.shared_folder = None
+    
+    def receive_columns(self):
+        """폴더의 목록 열이 준비되면 이 창의 목록을 만듦
+        
+        저장해 둔 이 창의 순서가 같은 목록 열과 설정의 것이면 그대로 쓰고, 아니면
+        필터/격리/섞기를 거친 순서를 백그라운드 스레드에서 만든다. 만드는 동안
+        목록 열에 생긴 변경분은 다 만든 뒤 finish_view()에서 한꺼번에 맞춘다.
+        """
+        columns = self.shared_folder.columns
+        generation = self.scan_generation
+        # 처음 스캔하는 폴더는 다 찾을 때까지 순서를 확정하지 않음
+        self.scan_in_progress = self.shared_folder.growing
+        saved = self.load_catalog_snapshot(self.loaded_folder, columns)
+        if saved is not None:
+            # 지난번 목록과 순서 그대로
+            catalog, count = saved
+            self.finish_view(generation, catalog, count)
+            # 저장 뒤 다른 창 등에서 격리된 파일 (메인 스레드에서 원본 정보를 읽지 않도록 따로)
+            threading.Thread(target=self.find_blocked, args=(generation, self.loaded_folder),
+                             name="quarantine-check", daemon=True).start()
+            return
+        if not len(columns):
+            # 처음 스캔하는 폴더는 빈 목록으로 시작해 스캔이 찾는 대로 채움
+            self.finish_view(generation, ImageCatalog(columns=columns), 0)
+            return
+        self.view_pending = True
+        threading.Thread(target=self.build_view,
+                         args=(generation, columns, len(columns), self.loaded_folder,
+                               self.active_filter),
+                         name="catalog-view", daemon=True).start()
+    
+    def build_view(self, generation, columns, count, folder_path, keep):
+        """(백그라운드) 목록 열의 처음 count개 항목으로 이 창의 목록을 만들어 메인 스레드로 전달
+        
+        keep(필터)에 맞지 않거나 격리된 파일은 빼고, 지연 섞기를 쓰지 않으면 섞는다.
+        """
+        entries = columns.live_entries(count)
         try:
-            # 이미지 로드 및 리사이즈
-            image = Image.open(image_path)
+            if keep is not None:
+                entries = self.folder_index.matching_entries(columns, entries, keep)
+            catalog = ImageCatalog(columns=columns, order=entries)
+            catalog.remove_paths(self.quarantine.blocked_under(folder_path, self.files))
+        except Exception as e:
+            print(f"목록 만들기 실패: {folder_path}, 오류: {e}")
+            catalog = ImageCatalog(columns=columns, order=entries)
+        if not self.lazy_shuffle:
+            catalog.shuffle()  # 랜덤 순서로 섞기
+        self.root.after(0, lambda: self.finish_view(generation, catalog, count))
+    
+    def finish_view(self, generation, catalog, count):
+        """만든 목록으로 교체 (count는 목록을 만들 때 본 목록 열의 항목 수)
+        
+        그 뒤에 목록 열에 추가된 항목은 필터/격리를 거쳐 넣고 삭제된 항목은 뺀다.
+        """
+        if generation != self.scan_generation:
+            return
+        self.view_pending = False
+        columns = catalog.columns
+        catalog.drop_dead()
+        self.image_files = catalog
+        self.catalog_dirty = True
+        self.current_index = 0
+        self.find_current_image()
+        added = [entry for entry in range(count, len(columns)) if columns.live[entry]]
+        self.apply_file_changes(self.visible_entries(added), [])
+        if self.image_files and not self.snapshot_painted:
+            if self.lazy_shuffle and not self.scan_in_progress:
+                # 목록 순서의 첫 파일 대신 저장된 순열의 다음 위치부터
+                self.current_index = self.pick_next_index()
+            self.show_current_image()
+        self.slideshow.update()
+    
+    def find_blocked(self, generation, folder_path):
+        """(백그라운드) folder_path 아래의 격리된 파일을 찾아 메인 스레드에서 목록에서 뺌"""
+        blocked = self.quarantine.blocked_under(folder_path, self.files)
+        if blocked:
+            self.root.after(0, lambda: self.drop_paths(generation, blocked))
+    
+    def drop_paths(self, generation, image_paths):
+        """image_paths를 목록에서 뺌 (그 사이 목록을 다시 만들었으면 무시)"""
+        if generation == self.scan_generation and not self.view_pending:
+            entries = self.image_files.columns.find_live(image_paths)
+            self.apply_file_changes([], list(entries.values()))
+    
+    def find_current_image(self):
+        """시작 화면의 이미지가 새 목록에 있으면 그 위치에서 이어서 (순차 모드)"""
+        if self.lazy_shuffle or not self.current_image:
+            return
+        position = self.image_files.index(self.current_image)
+        if position >= 0:
+            self.current_index = position
+    
+    def apply_entries(self, added, removed):
+        """(메인 스레드) 목록 열에 반영된 스캔/감시 변경분을 이 창의 목록에 반영
+        
+        added, removed는 목록 열의 항목 번호. 목록을 만드는 중이면 finish_view()가
+        맞추므로 건너뜀.
+        """
+        if self.view_pending or self.image_files.columns is not self.shared_folder.columns:
+            return
+        had_images = bool(self.image_files)
+        self.apply_file_changes(self.visible_entries(added), removed)
+        if not had_images and self.image_files and not self.snapshot_painted:
+            self.show_current_image()
+        self.slideshow.update()
+    
+    def remap_entries(self, mapping):
+        """목록 열을 다시 만든 뒤 이 창의 순서를 새 항목 번호로 옮김"""
+        if self.image_files.columns is self.shared_folder.columns:
+            self.image_files.remap(mapping)
+            self.catalog_dirty = True
+    
+    def scan_finished(self, stats, filled):
+        """폴더 스캔이 끝남 (stats가 None이면 공유 폴더가 응답하지 않아 중간에 멈춘 것)
+        
+        filled는 스캔 끝에 헤더 정보를 새로 읽은 파일 (필터를 쓰면 목록에 추가).
+        """
+        self.scan_in_progress = False
+        if filled and self.active_filter is not None and not self.view_pending:
+            shown = set(self.image_files.order)
+            entries = self.image_files.columns.find_live(filled).values()
+            self.apply_entries([entry for entry in entries if entry not in shown], [])
+        if stats is None:
+            print(f"로드된 이미지 파일 수: {len(self.image_files)} (스캔 중단, 연결되면 다시 확인)")
+        else:
+            print(f"로드된 이미지 파일 수: {len(self.image_files)} "
+                  f"(디렉터리 {stats['dirs_visited']}개 중 {stats['dirs_scanned']}개 스캔, "
+                  f"추가 {stats['added']}, 삭제 {stats['removed']}, {stats['seconds']}초)")
+        
+        # 다음 시작 때 바로 쓸 수 있게 완성된 목록 저장
+        self.save_snapshot()
+    
+    def photo_filter(self):
+        """설정한 필터의 조건 함수 (헤더 정보 [너비, 높이, 방향, 촬영일] -> bool, 모든 사진이면 None)"""
+        mode = self.config.get('photo_filter', 'all')
+        if mode == 'landscape':
+            return lambda meta: meta[0] > meta[1]
+        if mode == 'portrait':
+            return lambda meta: meta[1] > meta[0]
+        if mode == 'fits_aspect':
+            # 위젯과 가로/세로 비율 차이가 허용 범위 안인 사진 (가로 위젯이면 가로 사진만 남음)
+            widget_aspect = self.config.get('width', 300) / max(1, self.config.get('height', 200))
+            tolerance = self.config.get('aspect_tolerance', 0.2)
+            return lambda meta: abs(meta[0] / max(1, meta[1]) / widget_aspect - 1) <= tolerance
+        if mode == 'on_this_day':
+            # 다른 해의 같은 월/일에 찍은 사진
+            today = time.strftime("-%m-%d")
+            return lambda meta: meta[3].endswith(today)
+        return None
+    
+    def matching_filter(self, image_paths):
+        """헤더 정보가 필터 조건에 맞는 파일만 (필터가 없으면 그대로)"""
+        keep = self.active_filter
+        if keep is None:
+            return image_paths
+        matched = []
+        for path in image_paths:
+            meta = self.folder_index.get_metadata(path)
+            if meta is not None and keep(meta):
+                matched.append(path)
+        return matched
+    
+    def without_quarantined(self, image_paths):
+        """읽기 실패 기록이 있는 파일 제외"""
+        blocked = set(self.quarantine.blocked(image_paths, self.files))
+        return [path for path in image_paths if path not in blocked] if blocked else image_paths
+    
+    def visible_entries(self, entries):
+        """목록 열의 새 항목 중 이 창에 보여 줄 것 (격리된 파일 제외, 필터 적용)"""
+        if not entries or (self.active_filter is None and not self.quarantine.entries):
+            return entries
+        columns = self.image_files.columns
+        paths = {columns.path_of(entry): entry for entry in entries}
+        return [paths[path] for path in
+                self.matching_filter(self.without_quarantined(list(paths)))]
+    
+    def apply_file_changes(self, added, removed):
+        """추가/삭제된 항목(목록 열의 번호)만 현재 목록에 반영 (순서는 유지)"""
+        if added or removed:
+            self.catalog_dirty = True
+        if removed:
+            self.image_files.remove_entries(removed)
             
+            # 현재 이미지 위치 다시 맞추기
+            position = self.image_files.index(self.current_image) if self.current_image else -1
+            if position >= 0:
+                self.current_index = position
+            elif self.image_files:
+                self.current_index %= len(self.image_files)
+            else:
+                self.current_index = 0
+        
+        for entry in added:
+            self.image_files.append_entry(entry)
+            if self.lazy_shuffle:
+                # 지연 섞기는 목록이 커져도 순서를 다시 만들 필요 없음
+                continue
+            # 새 파일은 아직 보여주지 않은 구간의 임의 위치로 보내 섞인 순서 유지
+            last = len(self.image_files) - 1
+            self.image_files.swap(last, random.randint(min(self.current_index + 1, last), last))
+    
+    def get_display_box(self):
+        """이미지를 맞춰 넣을 위젯 크기 (너비, 높이)"""
+        widget_width = self.root.winfo_width()
+        widget_height = self.root.winfo_height()
+        
+        if widget_width <= 1 or widget_height <= 1:
+            widget_width = self.config.get('width', 300)
+            widget_height = self.config.get('height', 200)
+        return (widget_width, widget_height)
+    
+    def display_image(self, image_path):
+        """이미지 표시 (성공하면 True, 읽을 수 없으면 기록 후 목록에서 빼고 False)"""
+        try:
             # 위젯 크기에 맞게 조정
-            widget_width = self.root.winfo_width()
-            widget_height = self.root.winfo_height()
-            
-            if widget_width <= 1 or widget_height <= 1:
-                widget_width = self.config.get('width', 300)
-                widget_height = self.config.get('height', 200)
+            box = self.get_display_box()
             
-            image.thumbnail((widget_width, widget_height), Image.Resampling.LANCZOS)
+            # 미리 읽어둔 이미지가 있으면 사용, 없으면 직접 로드 및 리사이즈
+            with self.metrics.stage('wait_prefetch'):
+                image = self.prefetcher.take(image_path, box)
+            if image is None:
+                self.metrics.count('prefetch_miss')
+                image = self.load_rendition(image_path, box)
+            else:
+                self.metrics.count('prefetch_hit')
             
             # tkinter용 이미지로 변환
-            photo = ImageTk.PhotoImage(image)
+            with self.metrics.stage('photoimage'):
+                photo = ImageTk.PhotoImage(image)
             
-            # 이미지 표시
-            self.image_label.configure(image=photo, text="")
-            self.image_label.image = photo  # 참조 유지
+            # 다른 이미지로 바뀔 때만 전환 효과 (크기 조절 후 다시 그릴 때는 바로)
+            outgoing = self.current_rendition
+            if image_path == self.current_image or self.is_hidden:
+                outgoing = None
+            # 진행 중이던 전환/재생은 끝 화면 없이 멈추고 지금 이미지에서 이어서 전환
+            self.transition.stop()
+            self.animation.stop()
             self.current_image = image_path
+            self.current_rendition = image
+            self.snapshot_painted = False
+            self.transition.start(outgoing, image, box,
+                                  lambda: self.show_photo(photo, image_path, box))
+            
+            if self.load_started is not None:
+                self.time_to_first_image = time.perf_counter() - self.load_started
+                self.load_started = None
+                self.metrics.record('first_image', self.time_to_first_image)
+                print(f"첫 이미지 표시까지: {self.time_to_first_image * 1000:.0f}ms")
             
+            # 다음 이미지들 미리 준비
+            self.prefetch_upcoming(box)
+            self.quarantine.record_success(image_path)
+            return True
+            
+        except StorageUnavailable:
+            # 공유 폴더 문제이므로 격리하지 않고 목록에도 남겨 둠 (캐시에도 없는 사진)
+            self.metrics.count('storage_unavailable')
+            return False
         except Exception as e:
             print(f"이미지 로드 실패: {image_path}, 오류: {e}")
-            self.next_image()
+            if not isinstance(e, FileNotFoundError):
+                self.quarantine.record_failure(image_path, e, self.files)
+            self.drop_image(image_path)
+            return False
     
-    def next_image(self):
-        """다음 이미지로 이동"""
-        if not self.image_files:
+    def show_photo(self, photo, image_path, box):
+        """완성된 이미지 표시, 여러 프레임이면 첫 프레임을 보여 준 채로 나머지를 읽으며 재생"""
+        self.image_label.configure(image=photo, text="")
+        self.image_label.image = photo  # 참조 유지
+        self.frame_photo = None
+        self.animation.start(image_path, box, self.files)
+        self.mark_first_paint()
+        if (self.snapshot_saved_at is None
+                or time.monotonic() - self.snapshot_saved_at >= self.SNAPSHOT_INTERVAL):
+            self.save_snapshot()
+    
+    def show_frame(self, image):
+        """애니메이션/전환 프레임 표시 (크기와 모드가 같으면 PhotoImage를 새로 만들지 않고 덮어씀)"""
+        photo = self.frame_photo
+        if photo is not None and photo[1] == image.mode and photo[2] == image.size:
+            photo[0].paste(image)
             return
+        photo = ImageTk.PhotoImage(image)
+        self.frame_photo = (photo, image.mode, image.size)
+        self.image_label.configure(image=photo, text="")
+        self.image_label.image = photo  # 참조 유지
+    
+    def drop_image(self, image_path):
+        """표시할 수 없는 파일을 목록에서 제거"""
+        self.skipped_count += 1
+        self.catalog_dirty = True
+        self.metrics.count('skipped')
+        count = len(self.image_files)
+        if count and self.image_files[self.current_index] == image_path:
+            self.image_files.remove_at(self.current_index)
+            # 자리를 채운 항목이 다음 차례가 되도록 (순차 모드)
+            if not self.lazy_shuffle and count > 1:
+                self.current_index = (self.current_index - 1) % (count - 1)
+            elif count > 1:
+                self.current_index %= count - 1
+            else:
+                self.current_index = 0
+        else:
+            self.image_files.remove_paths([image_path])
+    
+    def show_current_image(self):
+        """현재 인덱스의 이미지 표시, 실패하면 다음 이미지로"""
+        if self.image_files and not self.display_image(self.image_files[self.current_index]):
+            self.next_image()
+    
+    def load_rendition(self, image_path, box, exact=True):
+        """box 크기로 줄인 이미지 반환 (피라미드 캐시에서 알맞은 단계를 골라 축소)
         
-        self.current_index = (self.current_index + 1) % len(self.image_files)
-        self.display_image(self.image_files[self.current_index])
+        공유 폴더가 응답하지 않으면 원본 확인 없이 캐시에 있는 단계로 대신 그림.
+        """
+        files = self.files
+        try:
+            return self.rendition_cache.render(image_path, box, self.decode_original,
+                                               self.metrics, exact, files)
+        except StorageUnavailable:
+            image = self.rendition_cache.render_cached(image_path, box, exact)
+            if image is None:
+                raise
+            self.metrics.count('offline_cache')
+            return image
+    
+    def decode_original(self, image_path, box):
+        """원본을 box 크기로 줄여 읽기 (캐시에 없을 때만)"""
+        if self.files is not LOCAL_FILES:
+            # 공유 폴더: 통째로 읽어 둔 메모리에서 바로 디코딩 (디코딩 중 원격 읽기 없음)
+            with self.files.open(image_path) as f:
+                return load_display_image(f, box, self.metrics)
+        return self.decode_engine.load(image_path, box, self.metrics)
+    
+    def prefetch_upcoming(self, box):
+        """현재 인덱스 다음 이미지들을 백그라운드에서 미리 읽기"""
+        count = len(self.image_files)
+        if count <= 1:
+            return
+        depth = min(self.prefetcher.depth, count - 1)
+        ahead = depth
+        if self.files is not LOCAL_FILES:
+            # 공유 폴더는 더 멀리까지 원본 파일을 메모리로 미리 읽음
+            ahead = min(max(depth, self.config.get('read_ahead_depth', 8)), count - 1)
+        if not self.lazy_shuffle:
+            indexes = [(self.current_index + i) % count for i in range(1, ahead + 1)]
+        elif self.scan_in_progress:
+            # 스캔 중에는 다음 이미지가 무작위로 정해지므로 미리 읽지 않음
+            return
+        else:
+            indexes = self.shuffle_order.peek(ahead, count)
+        upcoming = [self.image_files[i] for i in indexes]
+        if self.files is not LOCAL_FILES:
+            self.files.read_ahead([path for path in upcoming
+                                   if not self.rendition_cache.is_cached(path)])
+        self.prefetcher.schedule(upcoming[:depth], box)
+    
+    def pick_next_index(self):
+        """다음에 보여줄 이미지 인덱스"""
+        count = len(self.image_files)
+        if not self.lazy_shuffle:
+            return (self.current_index + 1) % count
+        if self.scan_in_progress:
+            # 목록이 아직 자라는 중이면 지금까지 찾은 것 중에서 임의로
+            return random.randrange(count)
+        index = self.shuffle_order.advance(count)
+        self.config.update(self.shuffle_order.state())
+        return index
+    
+    def next_image(self):
+        """다음 이미지로 이동 (읽을 수 없는 파일은 한 번에 MAX_SKIPS_PER_TICK개까지 건너뜀)"""
+        for _ in range(self.MAX_SKIPS_PER_TICK):
+            if not self.image_files:
+                return
+            
+            self.current_index = self.pick_next_index()
+            image_path = self.image_files[self.current_index]
+            if self.quarantine.is_quarantined(image_path, self.files):
+                self.drop_image(image_path)
+                continue
+            if self.display_image(image_path):
+                return
+        print(f"표시할 수 있는 이미지를 찾지 못했습니다 (건너뛴 파일 누적 {self.skipped_count}개)")
     
     def start_slideshow(self):
-        """슬라이드쇼 시작"""
-        def slideshow_loop():
-            while True:
-                if self.image_files and not self.is_hidden:
-                    self.root.after(0, self.next_image)
-                time.sleep(self.config.get('slideshow_interval', 5))
-        
-        if self.image_files:
-            self.display_image(self.image_files[0])
-            threading.Thread(target=slideshow_loop, daemon=True).start()
+        """슬라이드쇼 시작 (타이머는 항상 하나만 동작)"""
+        if self.image_files and not self.snapshot_painted:
+            if self.lazy_shuffle and not self.scan_in_progress:
+                # 지난번에 멈춘 다음 위치부터 이어서
+                self.current_index = self.pick_next_index()
+            self.show_current_image()
+        self.slideshow.start()
     
     def open_current_image(self, event):
         """현재 이미지를 기본 프로그램으로 열기"""
@@ -389,6 +4068,8 @@ class PhotoWidget:
         if self.is_hidden:
             self.root.deiconify()
             self.is_hidden = False
+            self.slideshow.update()
+            self.animation.update()
     
     def show_context_menu(self, event):
         """컨텍스트 메뉴 표시"""
@@ -401,7 +4082,7 @@ class PhotoWidget:
         """설정 창 열기"""
         settings_window = tk.Toplevel(self.root)
         settings_window.title("설정")
-        settings_window.geometry("400x450")
+        settings_window.geometry("400x570")
         settings_window.transient(self.root)
         settings_window.grab_set()
         
@@ -448,6 +4129,21 @@ class PhotoWidget:
             self.root.attributes('-alpha', alpha_var.get())
         alpha_scale.bind("<Motion>", update_alpha)
         
+        # 표시할 사진 필터 (헤더 정보로 목록 단계에서 거름)
+        ttk.Label(settings_window, text="표시할 사진:").pack(pady=(10, 5))
+        filter_names = list(self.PHOTO_FILTERS.values())
+        filter_var = tk.StringVar(value=self.PHOTO_FILTERS.get(
+            self.config.get('photo_filter', 'all'), filter_names[0]))
+        ttk.Combobox(settings_window, textvariable=filter_var, values=filter_names,
+                     state='readonly').pack(pady=5)
+        
+        # 전환 효과
+        ttk.Label(settings_window, text="전환 효과:").pack(pady=(10, 5))
+        transition_var = tk.StringVar(value=self.TRANSITIONS.get(
+            self.config.get('transition', 'none'), self.TRANSITIONS['none']))
+        ttk.Combobox(settings_window, textvariable=transition_var,
+                     values=list(self.TRANSITIONS.values()), state='readonly').pack(pady=5)
+        
         # 자동 시작 설정
         auto_start_var = tk.BooleanVar(value=self.config.get('auto_start', False))
         ttk.Checkbutton(settings_window, text="윈도우 시작시 자동 실행", 
@@ -458,8 +4154,17 @@ class PhotoWidget:
         button_frame.pack(pady=20)
         
         def save_settings():
+            folder_changed = folder_var.get() != self.config.get('folder_path', '')
+            photo_filter = next(key for key, name in self.PHOTO_FILTERS.items()
+                                if name == filter_var.get())
+            filter_changed = photo_filter != self.config.get('photo_filter', 'all')
             self.config['folder_path'] = folder_var.get()
+            self.config['photo_filter'] = photo_filter
+            self.config['transition'] = next(key for key, name in self.TRANSITIONS.items()
+                                             if name == transition_var.get())
+            self.transition.effect = self.config['transition']
             self.config['slideshow_interval'] = interval_var.get()
+            self.slideshow.set_interval(interval_var.get())
             self.config['auto_start'] = auto_start_var.get()
             self.config['position'] = position_var.get()
             self.config['alpha'] = alpha_var.get()
@@ -473,7 +4178,11 @@ class PhotoWidget:
             self.save_config()
             
             # 폴더가 변경되었으면 이미지 다시 로드
-            self.load_images()
+            if folder_changed or filter_changed:
+                # 필터만 바뀌어도 인덱스에서 목록을 다시 만듦
+                self.loaded_folder = None
+                self.load_images()
+                self.start_slideshow()
             
             settings_window.destroy()
             messagebox.showinfo("설정", "설정이 저장되었습니다.")
@@ -532,15 +4241,208 @@ class PhotoWidget:
         except Exception as e:
             messagebox.showerror("오류", f"자동 시작 설정 실패: {e}\n관리자 권한으로 실행했는지 확인해주세요.")
         
-    def run(self):
-        """프로그램 실행"""
+    def close(self):
+        """프로그램 종료 전 이 창의 재생을 멈추고 시작 화면 저장 (공유 부분은 WidgetEngine이 정리)"""
+        self.transition.stop()
+        self.animation.stop()
+        self.prefetcher.shutdown()
+        self.save_snapshot(wait=True)
+
+
+# 캐시 미리 만들기 작업 프로세스의 파일 읽기 동시 실행 제한 (부모가 넘겨준 세마포어)
+warm_io_slots = None
+
+
+def init_warm_worker(io_slots):
+    """(작업 프로세스) 읽기 제한 세마포어 등록"""
+    global warm_io_slots
+    warm_io_slots = io_slots
+
+
+def warm_one(image_path, cache_dir, edge):
+    """(작업 프로세스) 파일 하나의 피라미드를 만들어 저장하고
+    (내용 키, 항목, 파일 크기, 단계, 읽은 바이트, 헤더 정보) 반환
+    
+    파일은 읽기 제한 안에서 한 번에 통째로 읽고, 내용 키와 디코딩은 메모리에서 처리
+    """
+    with warm_io_slots:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    content_key = PyramidCache.fingerprint_data(data)
+    with Image.open(io.BytesIO(data)) as image:
+        metadata = image_metadata(image)
+    full_size = metadata[:2]
+    file_name = content_key + ".pyr"
+    target = os.path.join(cache_dir, file_name)
+    
+    # 내용이 같은 복사본으로 이미 만든 피라미드가 있으면 다시 디코딩하지 않음
+    existing = []
+    try:
+        with open(target, 'rb') as f:
+            header = PyramidCache._read_header(f)
+        existing = [level['edge'] for level in header['levels']]
+        if edge in existing:
+            entry = {'file': file_name, 'full': header['full']}
+            return (content_key, entry, os.path.getsize(target), sorted(existing),
+                    len(data), metadata)
+    except (OSError, ValueError):
+        existing = []
+    
+    base = load_display_image(io.BytesIO(data), (edge, edge))
+    levels = PyramidCache.derive_levels(base, edge, existing)
+    size, edges = PyramidCache.write_container(target, full_size, levels)
+    return content_key, {'file': file_name, 'full': full_size}, size, edges, len(data), metadata
+
+
+def warm_cache_main(argv=None):
+    """명령줄: 폴더 전체의 캐시(피라미드)를 Tk 없이 여러 프로세스로 미리 생성
+    
+    이미 만든 파일은 건너뛰므로 중간에 멈췄다가 다시 실행하면 이어서 진행한다.
+    """
+    import argparse
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    parser = argparse.ArgumentParser(prog="photo_widget.py --warm-cache",
+                                     description="슬라이드쇼 캐시 미리 만들기")
+    parser.add_argument('--folder', help="대상 폴더 (기본: 위젯 설정의 폴더)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                        help="디코딩 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument('--io-limit', type=int, default=4,
+                        help="동시에 파일을 읽는 프로세스 수 (느린 디스크/NAS는 1~2 권장)")
+    parser.add_argument('--max-edge', type=int, choices=PyramidCache.LEVELS,
+                        help="만들 가장 큰 단계 (기본: 위젯 크기를 덮는 단계)")
+    parser.add_argument('--cache-mb', type=int,
+                        help="캐시 최대 용량(MB)으로 설정에 저장 (기본: 설정값)")
+    args = parser.parse_args(argv)
+    
+    app_data_path = get_app_data_path()
+    config_file = os.path.join(app_data_path, "photo_widget_config.json")
+    config = {}
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+    except Exception as e:
+        print(f"설정 파일 로드 실패: {e}")
+    
+    folder_path = args.folder or config.get('folder_path')
+    if not folder_path or not os.path.isdir(folder_path):
+        print(f"폴더를 찾을 수 없습니다: {folder_path or '(설정 없음)'}")
+        return 1
+    if args.cache_mb:
+        config['cache_max_mb'] = args.cache_mb
         try:
-            self.root.mainloop()
-        finally:
-            # 프로그램 종료시 설정 저장
-            self.save_config()
+            with open(config_file, 'w', encoding='utf-8') as f:
+                json.dump(config, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"설정 저장 실패: {e}")
+    
+    # 기본 단계: 위젯 크기의 긴 변을 덮는 가장 작은 단계
+    edge = args.max_edge
+    if edge is None:
+        longest = max(config.get('width', 300), config.get('height', 200))
+        edge = next((level for level in PyramidCache.LEVELS if level >= longest),
+                    PyramidCache.LEVELS[-1])
+    
+    # 위젯과 같은 인덱스로 스캔 (바뀐 디렉터리만 다시 읽음)
+    print(f"폴더 스캔 중: {folder_path}")
+    folder_index = folder_index_for(app_data_path, folder_path)
+    folder_index.refresh(folder_path)
+    folder_index.save()
+    catalog = folder_index.build_catalog()
+    total = len(catalog)
+    print(f"이미지 {total}개, 단계 {edge}px, 프로세스 {args.workers}개, 동시 읽기 {args.io_limit}개")
+    
+    cache = PyramidCache(os.path.join(app_data_path, "cache"),
+                         config.get('cache_max_mb', 200) * 1024 * 1024)
+    quarantine = QuarantineStore(os.path.join(app_data_path, "quarantine.json"))
+    
+    context = multiprocessing.get_context('spawn')
+    pool = ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=context,
+                               initializer=init_warm_worker,
+                               initargs=(context.BoundedSemaphore(max(1, args.io_limit)),))
+    # 제출해 둔 작업 수 제한 (목록 전체를 한꺼번에 넣지 않음)
+    window = max(1, args.workers) * 2
+    pending = {}
+    paths = iter(catalog)
+    done = skipped = failed = bytes_read = 0
+    cache_full = False
+    started = time.perf_counter()
+    last_report = started
+    
+    try:
+        while True:
+            while not cache_full and len(pending) < window:
+                image_path = next(paths, None)
+                if image_path is None:
+                    break
+                try:
+                    stat = os.stat(image_path)
+                except OSError:
+                    skipped += 1
+                    continue
+                if quarantine.is_quarantined(image_path) or cache.has_level(image_path, stat, edge):
+                    skipped += 1
+                    continue
+                future = pool.submit(warm_one, image_path, cache.cache_dir, edge)
+                pending[future] = (image_path, stat)
+            if not pending:
+                break
+            
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                image_path, stat = pending.pop(future)
+                try:
+                    content_key, entry, size, edges, length, metadata = future.result()
+                except BrokenExecutor:
+                    raise
+                except Exception as e:
+                    print(f"이미지 처리 실패: {image_path}, 오류: {e}")
+                    quarantine.record_failure(image_path, e)
+                    failed += 1
+                    continue
+                bytes_read += length
+                quarantine.record_success(image_path)
+                folder_index.set_metadata(image_path, metadata)
+                # 새로 만든 항목이 용량을 넘기면 미리 만든 다른 항목을 밀어내지 않고 멈춤
+                if (content_key not in cache.entries
+                        and cache.total_bytes + size > cache.max_bytes):
+                    if not cache_full:
+                        print("캐시 용량이 가득 찼습니다. --cache-mb로 용량을 늘릴 수 있습니다.")
+                    cache_full = True
+                    cache._remove_file(entry['file'])
+                    continue
+                cache.register(content_key, entry, size, edges,
+                               cache.source_name(image_path), cache.make_key(image_path, stat))
+                done += 1
+            
+            now = time.perf_counter()
+            if now - last_report >= 2.0:
+                last_report = now
+                print(f"진행: {done + skipped + failed}/{total} "
+                      f"(생성 {done}, 건너뜀 {skipped}, 실패 {failed}), "
+                      f"{done / (now - started):.1f}개/초")
+    except KeyboardInterrupt:
+        print("중단되었습니다. 다시 실행하면 이어서 진행합니다.")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        cache.save_index()
+        quarantine.save()
+        folder_index.save()
+    
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"완료: 생성 {done}개, 건너뜀 {skipped}개, 실패 {failed}개, {elapsed:.1f}초")
+    print(f"처리량: {done / elapsed:.1f}개/초, 읽기 {bytes_read / (1024 * 1024) / elapsed:.1f}MB/초, "
+          f"캐시 {cache.total_bytes / (1024 * 1024):.1f}MB")
+    return 0
+
 
 if __name__ == "__main__":
+    # PyInstaller 실행 파일에서 디코딩 프로세스를 띄울 수 있게
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    
     # 필요한 라이브러리 확인
     try:
         import PIL
@@ -549,5 +4451,9 @@ if __name__ == "__main__":
         mb.showerror("오류", "Pillow 라이브러리가 필요합니다.\n\npip install Pillow 명령으로 설치해주세요.")
         exit(1)
     
-    app = PhotoWidget()
+    # 캐시 미리 만들기: python photo_widget.py --warm-cache [--folder 폴더] [--workers N] ...
+    if len(sys.argv) > 1 and sys.argv[1] == '--warm-cache':
+        sys.exit(warm_cache_main(sys.argv[2:]))
+    
+    app = WidgetEngine()
     app.run()
\ No newline at end of file
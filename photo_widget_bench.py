@@ -0,0 +1,744 @@
+"""포토위젯 헤드리스 벤치마크
+
+합성 사진 폴더(JPEG, PNG, TIFF, WebP, GIF / 1~50MP / 평평한 구조와 깊은 구조)를
+만들고 폴더 스캔, 디코딩, 리사이즈, PhotoImage 준비 단계를 화면 없이 측정해
+처리량, p50/p95/p99 지연 시간, 최대 메모리(RSS)를 JSON으로 출력한다.
+
+사용 예:
+    python photo_widget_bench.py --count 40 --sizes 1,12,50 --output run.json
+    python photo_widget_bench.py --corpus D:/bench_photos --baseline run.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+import multiprocessing
+
+from PIL import Image
+
+import photo_widget
+
+try:
+    import resource
+except ImportError:  # 윈도우
+    resource = None
+
+
+FORMATS = {
+    'jpeg': ('.jpg', {'format': 'JPEG', 'quality': 90}),
+    'png': ('.png', {'format': 'PNG'}),
+    'tiff': ('.tiff', {'format': 'TIFF'}),
+    'webp': ('.webp', {'format': 'WEBP', 'quality': 85}),
+    'gif': ('.gif', {'format': 'GIF'}),
+}
+
+
+def make_photo(megapixels, seed):
+    """사진과 비슷하게 압축되도록 그라디언트에 노이즈를 섞은 RGB 이미지 생성"""
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = random.Random(seed)
+    channels = []
+    for _ in range(3):
+        gradient = Image.linear_gradient('L').rotate(rng.randrange(360)).resize((width, height))
+        noise = Image.effect_noise((width, height), rng.uniform(20, 60))
+        channels.append(Image.blend(gradient, noise, 0.3))
+    return Image.merge('RGB', channels)
+
+
+def generate_corpus(root, count, sizes, formats, layout, seed=0):
+    """root 아래에 합성 사진 count장 생성. 생성한 파일 경로 목록 반환"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        megapixels = sizes[i % len(sizes)]
+        fmt = formats[i % len(formats)]
+        suffix, options = FORMATS[fmt]
+        if layout == 'nested':
+            # 연도/월/행사 형태의 깊은 폴더 구조
+            directory = os.path.join(root, f"{2010 + rng.randrange(15)}",
+                                     f"{rng.randrange(1, 13):02d}",
+                                     f"event_{rng.randrange(count // 5 + 1)}", "camera")
+        else:
+            directory = root
+        os.makedirs(directory, exist_ok=True)
+
+        image = make_photo(megapixels, seed + i)
+        if fmt == 'gif':
+            image = image.convert('P', palette=Image.Palette.ADAPTIVE)
+        path = os.path.join(directory, f"IMG_{i:06d}_{megapixels}mp{suffix}")
+        image.save(path, **options)
+        paths.append(path)
+    return paths
+
+
+def percentile(samples, fraction):
+    """nearest-rank 백분위수"""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb():
+    """현재 프로세스의 최대 RSS (MB), 측정할 수 없으면 None"""
+    # 리눅스의 ru_maxrss는 exec 전 부모(fork된 복사본)의 값까지 이어받으므로
+    # 가능하면 프로세스 자신의 최고치인 VmHWM을 사용
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # 리눅스는 KB, macOS는 바이트 단위
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def summarize(latencies, seconds):
+    """지연 시간 목록(초)을 보고서 형식으로 요약"""
+    result = {'count': len(latencies), 'seconds': round(seconds, 4),
+              'throughput_per_s': round(len(latencies) / seconds, 2) if seconds else None}
+    if latencies:
+        for name, fraction in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            result[name] = round(percentile(latencies, fraction) * 1000, 2)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def timed(function, items):
+    """items마다 function을 실행하고 (지연 시간 목록, 전체 시간) 반환"""
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        begin = time.perf_counter()
+        function(item)
+        latencies.append(time.perf_counter() - begin)
+    return latencies, time.perf_counter() - start
+
+
+def stage_scan(corpus, paths, box):
+    """폴더 스캔: 처음(인덱스 없음)과 변경 없는 재스캔"""
+    extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+    with tempfile.TemporaryDirectory() as work_dir:
+        index = photo_widget.FolderIndex(os.path.join(work_dir, "index.json"), extensions)
+        start = time.perf_counter()
+        index.refresh(corpus)
+        cold = time.perf_counter() - start
+        cold_stats = index.get_stats()
+        start = time.perf_counter()
+        index.refresh(corpus)
+        warm = time.perf_counter() - start
+    files = cold_stats['files_total']
+    return {'files': files, 'dirs': cold_stats['dirs_visited'],
+            'cold_seconds': round(cold, 4), 'warm_seconds': round(warm, 4),
+            'cold_files_per_s': round(files / cold, 1) if cold else None,
+            'warm_files_per_s': round(files / warm, 1) if warm else None,
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def stage_decode(corpus, paths, box):
+    """원본 해상도 전체 디코딩"""
+    def decode(path):
+        with Image.open(path) as image:
+            image.load()
+    return summarize(*timed(decode, paths))
+
+
+def stage_resize(corpus, paths, box):
+    """표시 경로의 축소 디코딩 (draft + thumbnail)"""
+    return summarize(*timed(lambda path: photo_widget.load_display_image(path, box), paths))
+
+
+def stage_photoimage(corpus, paths, box):
+    """PhotoImage 준비: 축소된 이미지를 Tk가 받는 RGB/RGBA 바이트로 변환
+
+    화면이 없으므로 ImageTk.PhotoImage가 Tk에 넘기기 전까지의 변환만 측정한다.
+    """
+    renditions = [photo_widget.load_display_image(path, box) for path in paths]
+
+    def prepare(image):
+        mode = 'RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB'
+        image.convert(mode).tobytes()
+    return summarize(*timed(prepare, renditions))
+
+
+def stage_engines(corpus, paths, box):
+    """DecodeEngine 실행 방식(inline/thread/process)별 형식 단위 비교
+
+    미리 읽기처럼 두 스레드가 동시에 요청하는 동안, 메인(Tk) 스레드 역할의
+    루프가 5ms 주기를 얼마나 놓치는지(GIL 경합)도 함께 잰다.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+
+    by_format = {}
+    for path in paths:
+        by_format.setdefault(os.path.splitext(path)[1].lower(), []).append(path)
+
+    results = {}
+    for mode in ('inline', 'thread', 'process'):
+        engine = photo_widget.DecodeEngine(mode)
+        if mode == 'process':
+            # 프로세스 시작 비용은 한 번뿐이므로 측정에서 제외
+            engine.load(paths[0], box)
+        mode_result = {}
+        for suffix, group in sorted(by_format.items()):
+            lags = []
+            done = threading.Event()
+
+            def main_loop():
+                while not done.is_set():
+                    begin = time.perf_counter()
+                    time.sleep(0.005)
+                    lags.append(max(0.0, time.perf_counter() - begin - 0.005))
+
+            ticker = threading.Thread(target=main_loop)
+            ticker.start()
+            with ThreadPoolExecutor(max_workers=2) as callers:
+                start = time.perf_counter()
+
+                def one(path):
+                    begin = time.perf_counter()
+                    engine.load(path, box)
+                    return time.perf_counter() - begin
+                latencies = list(callers.map(one, group))
+                seconds = time.perf_counter() - start
+            done.set()
+            ticker.join()
+            summary = summarize(latencies, seconds)
+            summary['main_thread_lag_p99_ms'] = round(percentile(lags, 0.99) * 1000, 2) if lags else None
+            mode_result[suffix] = summary
+        engine.shutdown()
+        results[mode] = mode_result
+    return results
+
+
+
+class TimerLoop:
+    """Tk 없이 after/after_cancel만 흉내 내는 실시간 타이머 루프"""
+
+    def __init__(self):
+        import heapq
+        import threading
+        self.heapq = heapq
+        self.jobs = []
+        self.cancelled = set()
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def after(self, delay_ms, callback):
+        with self.lock:
+            self.sequence += 1
+            self.heapq.heappush(self.jobs, (time.monotonic() + delay_ms / 1000,
+                                            self.sequence, callback))
+            return self.sequence
+
+    def after_cancel(self, job):
+        self.cancelled.add(job)
+
+    def run_until(self, condition, timeout):
+        end = time.monotonic() + timeout
+        while not condition() and time.monotonic() < end:
+            with self.lock:
+                job = self.jobs[0] if self.jobs else None
+            if job is None or job[0] > time.monotonic():
+                time.sleep(0.001)
+                continue
+            with self.lock:
+                self.heapq.heappop(self.jobs)
+            if job[1] not in self.cancelled:
+                job[2]()
+
+
+def make_animation(path, frames, size, delay_ms, fmt):
+    """움직이는 합성 이미지 (프레임마다 움직이는 원과 잡음이 있는 배경)"""
+    rng = random.Random(frames)
+    base = make_photo(size[0] * size[1] / 1_000_000, 0).resize(size)
+    images = []
+    for index in range(frames):
+        frame = base.copy()
+        x = int((index / frames) * size[0])
+        frame.paste((rng.randrange(256), 40, 200), (x, size[1] // 3, min(size[0], x + 40),
+                                                    size[1] // 3 + 40))
+        images.append(frame if fmt == 'WEBP' else frame.quantize(64))
+    images[0].save(path, format=fmt, save_all=True, append_images=images[1:],
+                   duration=delay_ms, loop=0)
+
+
+def play_animation(path, box, budget_bytes, frames, delay_ms):
+    """(자식 프로세스) 애니메이션을 두 바퀴 재생하며 CPU와 메모리 측정
+
+    두 번째 바퀴에서 프레임 캐시 효과가 드러난다. 표시 단계(PhotoImage)는
+    제외하고 프레임 디코딩/축소/보관 비용만 잰다.
+    """
+    loop = TimerLoop()
+    shown = [0]
+
+    def on_frame(image):
+        shown[0] += 1
+
+    metrics = photo_widget.StageMetrics(enabled=True)
+    player = photo_widget.AnimationPlayer(loop, on_frame, lambda: True, budget_bytes, metrics)
+    target = frames * 2
+    player.start(path, box)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    loop.run_until(lambda: shown[0] >= target, timeout=target * delay_ms / 1000 * 3)
+    seconds = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    player.stop()
+    return {
+        'frames_shown': shown[0],
+        'frames_decoded': player.decoded_count,
+        'late_ticks': metrics.counters.get('animation_late', 0),
+        'seconds': round(seconds, 2),
+        'cpu_percent': round(cpu / seconds * 100, 1),
+        'budget_mb': round(budget_bytes / (1024 * 1024), 1),
+        'frame_cache_peak_mb': round(player.peak_bytes / (1024 * 1024), 1),
+        'decode_p95_ms': metrics.summary()['stages'].get('animation_decode', {}).get('p95_ms'),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def stage_animation(corpus, paths, box):
+    """500프레임(480x360, 20ms) 애니메이션을 실제 속도로 재생하며 CPU와 메모리 측정
+
+    프레임 예산이 전체를 담는 경우(두 번째 바퀴부터 디코딩 없음)와 4분의 1만
+    담는 경우(매 바퀴 다시 디코딩하며 스트리밍)를 비교한다. CPU는 재생 시간
+    대비 프로세스 CPU 시간(코어 1개 = 100%). 경우마다 새 프로세스에서 실행한다.
+    """
+    frames, size, delay_ms = 500, (480, 360), 20
+    fitted = photo_widget.fit_size(size, box)
+    # 프레임은 RGB 또는 RGBA로 보관하므로 큰 쪽 기준
+    frame_bytes = fitted[0] * fitted[1] * 4
+    budgets = {'fits': int(frames * frame_bytes * 1.2), 'streaming': frames * frame_bytes // 4}
+
+    context = multiprocessing.get_context('spawn')
+    results = {'fully_expanded_mb': round(frames * size[0] * size[1] * 4 / (1024 * 1024), 1)}
+    # --corpus가 실제 사진 폴더일 수 있으므로 테스트 파일은 임시 디렉터리에
+    with tempfile.TemporaryDirectory() as work_dir:
+        for fmt, suffix in (('GIF', '.gif'), ('WEBP', '.webp')):
+            path = os.path.join(work_dir, "animation" + suffix)
+            # 프레임을 모두 펼쳐야 하는 생성 과정은 측정 프로세스에 섞이지 않게
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                executor.submit(make_animation, path, frames, size, delay_ms, fmt).result()
+            for budget_name, budget_bytes in budgets.items():
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    results[f"{suffix[1:]}_{budget_name}"] = executor.submit(
+                        play_animation, path, box, budget_bytes, frames, delay_ms).result()
+    return results
+
+
+class LatencyFiles(photo_widget.LocalFiles):
+    """공유 폴더 대신 쓰는 로컬 파일 시스템: 접근마다 지연을 넣고, 멈춤 상태에서는 응답하지 않음"""
+
+    def __init__(self, latency=0.02, bandwidth_mb=50):
+        import threading
+        self.latency = latency
+        self.bandwidth = bandwidth_mb * 1024 * 1024
+        # clear()하면 다시 set()할 때까지 모든 접근이 멈춤 (끊긴 SMB 흉내)
+        self.running = threading.Event()
+        self.running.set()
+
+    def _delay(self, size=0):
+        self.running.wait()
+        time.sleep(self.latency + size / self.bandwidth)
+
+    def stat(self, path):
+        self._delay()
+        return super().stat(path)
+
+    def read(self, path):
+        data = super().read(path)
+        self._delay(len(data))
+        return data
+
+    def read_head(self, path, size):
+        data = super().read_head(path, size)
+        self._delay(len(data))
+        return data
+
+    def read_tail(self, path, size):
+        data = super().read_tail(path, size)
+        self._delay(len(data))
+        return data
+
+    def open(self, path):
+        self._delay()
+        return LatencyReader(self, super().open(path))
+
+    def list_dir(self, path):
+        self._delay()
+        return super().list_dir(path)
+
+
+class LatencyReader:
+    """LatencyFiles.open()이 돌려주는 파일 객체: 읽을 때마다 받은 양만큼 대역폭 지연"""
+
+    def __init__(self, files, f):
+        self.files = files
+        self.f = f
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.files.running.wait()
+        time.sleep(len(data) / self.files.bandwidth)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.f.close()
+
+
+def stage_storage(corpus, paths, box):
+    """공유 폴더 흉내(접근마다 20ms + 50MB/s, 멈춤)에서 SlowStorage를 거친 표시 경로
+
+    - cold: 캐시가 빈 상태로 한 장씩 표시 (미리 읽기 없음 / 다음 8장 미리 읽기)
+    - stalled: 응답이 멈춘 뒤 캐시된 사진을 표시하는 시간과, 폴더 스캔이
+      제한 시간 안에 중단되는지
+    - recover: 대기열의 미리 읽기가 시간 초과로 취소된 뒤 연결이 돌아오면 같은 사진을
+      다시 읽고 미리 읽기도 다시 하는지
+    """
+    latency, timeout = 0.02, 1.0
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        def make(name):
+            files = LatencyFiles(latency)
+            storage = photo_widget.SlowStorage(files, timeout=timeout, retry_seconds=60)
+            cache = photo_widget.PyramidCache(os.path.join(work_dir, name), 1024 * 1024 * 1024)
+
+            def decode(path, size):
+                with storage.open(path) as f:
+                    return photo_widget.load_display_image(f, size)
+            return files, storage, cache, decode
+
+        for name, ahead in (('cold_no_read_ahead', 0), ('cold_read_ahead', 8)):
+            files, storage, cache, decode = make(name)
+
+            def show(position):
+                if ahead:
+                    storage.read_ahead(paths[position + 1:position + 1 + ahead])
+                cache.render(paths[position], box, decode, files=storage)
+            results[name] = summarize(*timed(show, range(len(paths))))
+
+        files, storage, cache, decode = make('stalled')
+        for path in paths:
+            cache.render(path, box, decode, files=storage)
+        files.running.clear()
+        served = [0]
+
+        def show_stalled(path):
+            try:
+                cache.render(path, box, decode, files=storage)
+            except photo_widget.StorageUnavailable:
+                if cache.render_cached(path, box) is not None:
+                    served[0] += 1
+        stalled = summarize(*timed(show_stalled, paths))
+        stalled['served_from_cache'] = served[0]
+
+        # 새로 연결한 상태에서 스캔이 멈춘 공유 폴더를 만나면
+        scan_storage = photo_widget.SlowStorage(files, timeout=timeout)
+        index = photo_widget.FolderIndex(os.path.join(work_dir, "index.json"),
+                                         photo_widget.IMAGE_EXTENSIONS, files=scan_storage)
+        start = time.perf_counter()
+        try:
+            index.refresh(corpus)
+            stalled['scan_aborted'] = False
+        except photo_widget.StorageUnavailable:
+            stalled['scan_aborted'] = True
+        stalled['scan_seconds'] = round(time.perf_counter() - start, 3)
+        stalled['timeout_seconds'] = timeout
+        files.running.set()
+        results['stalled'] = stalled
+
+        # 읽기 스레드 하나가 멈춘 읽기에 묶여 있는 동안 미리 읽기는 대기열에 남고,
+        # 그 사진을 기다리던 read가 시간 초과로 미리 읽기를 취소
+        retry = 0.2
+        recover_storage = photo_widget.SlowStorage(files, timeout=timeout, readers=1,
+                                                   retry_seconds=retry)
+        files.running.clear()
+
+        def blocked_read():
+            try:
+                recover_storage.read(paths[0])
+            except photo_widget.StorageUnavailable:
+                pass
+        blocker = threading.Thread(target=blocked_read)
+        blocker.start()
+        time.sleep(0.05)
+        recover_storage.read_ahead([paths[1]])
+        recover = {}
+        try:
+            recover_storage.read(paths[1])
+            recover['timed_out'] = False
+        except photo_widget.StorageUnavailable:
+            recover['timed_out'] = True
+        recover['pending_after_timeout'] = len(recover_storage.pending)
+        files.running.set()
+        blocker.join()
+        time.sleep(retry)
+        try:
+            recover_storage.read(paths[1])
+            recover['read_after_recover'] = 'ok'
+        except Exception as e:
+            recover['read_after_recover'] = type(e).__name__
+        recover_storage.read_ahead([paths[2]])
+        recover['read_ahead_resumed'] = paths[2] in recover_storage.pending
+        recover_storage.read(paths[2])
+        recover['pending_after_read_ahead'] = len(recover_storage.pending)
+        results['recover'] = recover
+    return results
+
+
+def camera_roll_paths(count, per_folder=200):
+    """카메라 롤처럼 연/월/행사별 폴더에 나뉜 가짜 사진 경로 count개 (평균 80자 정도)"""
+    root = os.path.join(os.sep, "Users", "photographer", "Pictures", "Camera Roll")
+    paths = []
+    for number in range(count):
+        folder = number // per_folder
+        year = 2005 + folder // 120
+        month = folder // 10 % 12 + 1
+        paths.append(os.path.join(root, str(year), f"{year}-{month:02d} Event {folder}",
+                                  f"IMG_{number:07d}.jpg"))
+    return paths
+
+
+def build_catalog(paths):
+    """경로 목록(디렉터리별로 모여 있음)으로 폴더 인덱스처럼 디렉터리 단위로 목록을 만듦"""
+    columns = photo_widget.CatalogColumns()
+    for directory, group in groupby(paths, os.path.dirname):
+        columns.add_directory(directory, [os.path.basename(path) for path in group])
+    return photo_widget.ImageCatalog(columns=columns, order=columns.live_entries())
+
+
+def stage_catalog(corpus, paths, box, counts=(100_000, 1_000_000)):
+    """이미지 목록 메모리: 경로 문자열 리스트와 ImageCatalog (100k/1M개, tracemalloc)
+
+    만들기/섞기 시간과, 저장-복원 / 삭제 / compact 뒤 번호 옮기기가 리스트와 같은
+    결과를 내는지도 확인한다.
+    """
+    results = {}
+    for count in counts:
+        gc.collect()
+        tracemalloc.start()
+        names = camera_roll_paths(count)
+        list_bytes = tracemalloc.get_traced_memory()[0]
+        catalog = build_catalog(names)
+        gc.collect()
+        catalog_bytes = tracemalloc.get_traced_memory()[0] - list_bytes
+        tracemalloc.stop()
+        del catalog
+        start = time.perf_counter()
+        catalog = build_catalog(names)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        catalog.shuffle()
+        shuffle_seconds = time.perf_counter() - start
+        results[count] = {
+            'average_path_chars': round(sum(map(len, names)) / count, 1),
+            'list_mb': round(list_bytes / 1e6, 1),
+            'catalog_mb': round(catalog_bytes / 1e6, 1),
+            'build_seconds': round(build_seconds, 3),
+            'shuffle_seconds': round(shuffle_seconds, 3),
+        }
+        del names, catalog
+
+    # 동작 확인: 리스트로 같은 일을 했을 때와 결과 비교
+    names = camera_roll_paths(5000, per_folder=50)
+    catalog = build_catalog(names)
+    catalog.shuffle()
+    expected = list(catalog)
+    checks = {}
+    columns, extra = photo_widget.CatalogColumns.from_bytes(
+        catalog.columns.to_bytes({'folder': 'bench'}))
+    order, header = photo_widget.ImageCatalog.order_from_bytes(catalog.to_bytes())
+    restored = photo_widget.ImageCatalog(columns=columns, order=order)
+    checks['round_trip'] = (list(restored) == expected and extra == {'folder': 'bench'}
+                            and header['token'] == columns.token == catalog.columns.token
+                            and header['entries'] == len(columns))
+
+    # 다른 창이 같은 열을 다른 순서로 보고 있는 상태에서 대부분 삭제
+    other = photo_widget.ImageCatalog(columns=catalog.columns, order=array('I', catalog.order))
+    other.shuffle()
+    other_expected = list(other)
+    removed = set(random.Random(3).sample(names, 4000))
+    entries = catalog.columns.remove(removed)
+    catalog.drop_dead()
+    kept = [path for path in expected if path not in removed]
+    checks['remove'] = (len(entries) == len(removed) and list(catalog) == kept
+                        and catalog.columns.live_count == len(kept)
+                        and not catalog.columns.find_live(removed)
+                        and all(catalog[catalog.index(path)] == path for path in kept[:100]))
+    needed = catalog.columns.needs_compact()
+    mapping = catalog.columns.compact()
+    catalog.remap(mapping)
+    other.remap(mapping)
+    checks['compact_remap'] = (needed and len(catalog.columns) == len(kept)
+                               and list(catalog) == kept
+                               and list(other) == [path for path in other_expected
+                                                   if path not in removed])
+    results['checks'] = checks
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def stage_shuffle(corpus, paths, box, count=1_000_000):
+    """LazyShuffle: 큰 목록에서 다음 인덱스 계산 시간과, 목록이 바뀌는 동안 한 바퀴가 온전한지
+
+    - steady: count개 목록에서 advance 지연 시간
+    - laps: 크기가 그대로 / 바퀴 도중에 범위 안에서 / 범위를 넘게 커질 때, 바퀴를 시작할
+      때 있던 인덱스가 그 바퀴에 겹치지 않고 모두 나오는지, 다음 바퀴는 전체가 나오는지
+    """
+    order = photo_widget.LazyShuffle(seed=1)
+    steps = min(count, 200_000)
+    results = {'steady': summarize(*timed(lambda _: order.advance(count), range(steps)))}
+
+    def laps(order, sizes):
+        """sizes[k]개일 때 k번째 advance 결과를 바퀴(시드)별로 나눔 - [(범위, 결과 목록)]"""
+        result = []
+        seed = None
+        for size in sizes:
+            value = order.advance(size)
+            if order.seed != seed:
+                seed = order.seed
+                result.append((order.domain, []))
+            result[-1][1].append(value)
+        return result
+
+    checks = {}
+    for name, start, grown in (('fixed', 1000, 1000), ('grow_in_domain', 700, 1000),
+                               ('grow_past_domain', 1000, 5000)):
+        order = photo_widget.LazyShuffle(seed=2)
+        (first_domain, first), (_, second) = laps(
+            order, [start] * (start // 2) + [grown] * (8 * grown))[:2]
+        checks[name] = {
+            # 바퀴를 시작할 때 있던 항목은 모두 한 번씩 (도중에 늘어난 항목은 이미 지난
+            # 자리에 놓였거나 이번 바퀴의 범위를 넘으면 다음 바퀴부터)
+            'first_lap_complete': set(range(start)) <= set(first),
+            'first_lap_repeats': len(first) - len(set(first)),
+            'second_lap_complete': sorted(second) == list(range(grown)),
+        }
+    results['laps'] = checks
+    return results
+
+
+STAGES = {
+    'scan': stage_scan,
+    'decode': stage_decode,
+    'resize': stage_resize,
+    'photoimage': stage_photoimage,
+    'engines': stage_engines,
+    'animation': stage_animation,
+    'storage': stage_storage,
+    'shuffle': stage_shuffle,
+    'catalog': stage_catalog,
+}
+
+
+def run_stage(name, corpus, paths, box):
+    """(자식 프로세스) 단계 하나를 실행해 결과 반환 - 최대 RSS를 단계별로 분리하기 위함"""
+    return STAGES[name](corpus, paths, box)
+
+
+def compare(current, baseline):
+    """이전 결과 대비 변화율 출력"""
+    for name, result in current['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if not previous:
+            continue
+        for key in ('throughput_per_s', 'p50_ms', 'p95_ms', 'p99_ms',
+                    'cold_seconds', 'warm_seconds', 'peak_rss_mb'):
+            if result.get(key) and previous.get(key):
+                change = (result[key] - previous[key]) / previous[key] * 100
+                print(f"{name:>10} {key:>16}: {previous[key]:>10} -> {result[key]:>10} "
+                      f"({change:+.1f}%)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="포토위젯 헤드리스 벤치마크")
+    parser.add_argument('--corpus', help="이미 있는 사진 폴더 사용 (없으면 합성 폴더 생성)")
+    parser.add_argument('--count', type=int, default=30, help="생성할 사진 수")
+    parser.add_argument('--sizes', default="1,12,50", help="사진 크기 목록 (MP, 쉼표 구분)")
+    parser.add_argument('--formats', default=",".join(FORMATS), help="형식 목록 (쉼표 구분)")
+    parser.add_argument('--layout', choices=('flat', 'nested'), default='nested')
+    parser.add_argument('--box', default="300x200", help="위젯 크기 (너비x높이)")
+    parser.add_argument('--stages', default=",".join(STAGES), help="실행할 단계 (쉼표 구분)")
+    parser.add_argument('--keep', action='store_true', help="생성한 합성 폴더를 지우지 않음")
+    parser.add_argument('--output', help="결과 JSON 파일 (없으면 표준 출력)")
+    parser.add_argument('--baseline', help="비교할 이전 결과 JSON 파일")
+    args = parser.parse_args(argv)
+
+    box = tuple(int(value) for value in args.box.lower().split('x'))
+    work_dir = None
+    if args.corpus:
+        corpus = os.path.abspath(args.corpus)
+        with tempfile.TemporaryDirectory() as index_dir:
+            index = photo_widget.FolderIndex(os.path.join(index_dir, "index.json"),
+                                             photo_widget.IMAGE_EXTENSIONS)
+            index.refresh(corpus)
+            paths = list(index.build_catalog())
+        corpus_info = {'path': corpus, 'files': len(paths)}
+    else:
+        work_dir = tempfile.mkdtemp(prefix="photo_widget_bench_")
+        corpus = work_dir
+        sizes = [float(size) for size in args.sizes.split(',')]
+        formats = args.formats.split(',')
+        start = time.perf_counter()
+        paths = generate_corpus(corpus, args.count, sizes, formats, args.layout)
+        print(f"합성 사진 {len(paths)}장 생성: {time.perf_counter() - start:.1f}초 ({corpus})",
+              file=sys.stderr)
+        corpus_info = {'path': corpus, 'files': len(paths), 'sizes_mp': sizes,
+                       'formats': formats, 'layout': args.layout}
+
+    report = {
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'pillow': Image.__version__, 'cpu_count': os.cpu_count()},
+        'corpus': corpus_info,
+        'box': list(box),
+        'stages': {},
+    }
+    try:
+        # 단계마다 새 프로세스에서 실행해 최대 RSS가 섞이지 않게 함
+        context = multiprocessing.get_context('spawn')
+        for name in args.stages.split(','):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                report['stages'][name] = executor.submit(run_stage, name, corpus, paths,
+                                                         box).result()
+            print(f"{name}: {report['stages'][name]}", file=sys.stderr)
+    finally:
+        if work_dir and not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()